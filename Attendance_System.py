@@ -1,11 +1,6 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import face_recognition
 from datetime import datetime
-from PIL import Image
-import pandas as pd
-import numpy as np
-import cv2
 import os
 import time
 
@@ -212,14 +207,48 @@ st.sidebar.markdown('<div style="text-align: center; margin-bottom: 20px;"><h1 s
 
 menu = ["🏠 Home", "📸 Mark Attendance", "👤 Register", "📊 Attendance Sheet", "ℹ️ Help"]
 choice = st.sidebar.selectbox("", menu)
+show_performance = st.sidebar.checkbox("📈 Performance panel")
 
 # Initialize frame window for camera
 FRAME_WINDOW = st.empty()
 
 # Paths
 path = 'Register_Data'
-images = []
-classNames = []
+
+# Nearest-neighbour index: 'flat' (exact), 'ivf' (partitioned) or 'auto' (ivf for large rosters).
+# Raising INDEX_NPROBE improves recall of the ivf index at the cost of latency.
+INDEX_KIND = 'auto'
+INDEX_NPROBE = 8
+
+# Performance panel: refresh interval (seconds) and the files it exports on each refresh
+PANEL_REFRESH = 1.0
+METRICS_EXPORTS = ['metrics.prom', 'metrics.json']
+
+# Tracking mode: run full detection only every DETECT_EVERY frames (or when a face is lost)
+# and carry identities along tracks in between
+TRACKING = True
+DETECT_EVERY = 10
+
+# Adaptive detection: pick the detection scale per frame from recent face sizes so detection
+# stays within DETECT_BUDGET seconds, and search near known faces between full-frame sweeps
+ADAPTIVE_DETECTION = True
+DETECT_BUDGET = 0.05
+
+# Motion gate: skip detection while the scene is static. MOTION_SENSITIVITY is the fraction of the
+# picture that must change; detection still runs at least every MOTION_MAX_IDLE seconds
+MOTION_GATE = True
+MOTION_SENSITIVITY = 0.01
+MOTION_MAX_IDLE = 5.0
+IDLE_FRAME_INTERVAL = 0.2
+# Times each face is resampled when encoding: higher is slightly more accurate and proportionally slower
+NUM_JITTERS = 1
+# Face detector: 'hog' (dlib, most accurate), or a cheap OpenCV first stage confirmed by HOG or landmarks
+# ('haar+hog', 'ssd+hog', ...; see detectors.py). Compare them on a recording with `python -m batch --compare-detectors`
+DETECTOR = 'hog'
+# Skip faces too small, blurred or turned away to match before encoding them (thresholds in quality.py)
+QUALITY_GATE = True
+# Seconds between checks of Register_Data for photos added, replaced or removed while the camera runs
+ROSTER_POLL_INTERVAL = 2.0
 
 # Create Register_Data directory if it doesn't exist
 if not os.path.exists(path):
@@ -230,11 +259,108 @@ if not os.path.exists('Attendance_Sheet.csv'):
     with open('Attendance_Sheet.csv', 'w') as f:
         f.write('NAME,TIME,DATE')
 
+# Heavy modules (face_recognition/dlib, cv2, pandas) are imported only by the pages and
+# cached loaders that need them, so reruns of the Home and Help pages stay fast.
+# Loaded resources live in process-wide caches and are cleared when someone registers.
+
+@st.cache_data
+def registered_users():
+    from encoding_store import list_identities
+    return list_identities(path)
+
+
+@st.cache_data
+def user_thumbnails():
+    """Thumbnail of each registered user's first photo that has one, by name."""
+    from encoding_store import EncodingStore, thumbnail_path
+    store = EncodingStore()
+    thumbnails = {}
+    for entry in store.entries:
+        thumbnail = thumbnail_path(store.store_dir, entry['sha1'])
+        if entry['name'] not in thumbnails and os.path.exists(thumbnail):
+            thumbnails[entry['name']] = thumbnail
+    return thumbnails
+
+
+@st.cache_resource(show_spinner=False)
+def load_roster():
+    """Sync the encoding store and build the matcher once per process."""
+    from encoding_store import EncodingStore, store_lock
+    from matcher import FaceMatcher
+    from templates import MAX_TEMPLATES
+    with store_lock():
+        store = EncodingStore()
+        failed = store.sync(path)
+        matcher = FaceMatcher.from_store(store, kind=INDEX_KIND, nprobe=INDEX_NPROBE, max_templates=MAX_TEMPLATES)
+    return matcher, failed
+
+
+@st.cache_resource
+def roster_watcher():
+    """Republishes the roster when photos in Register_Data change, so running cameras pick them up."""
+    from roster_watcher import RosterWatcher
+    from templates import MAX_TEMPLATES
+    return RosterWatcher(path, max_templates=MAX_TEMPLATES, poll_interval=ROSTER_POLL_INTERVAL).start()
+
+
+@st.cache_resource
+def attendance_log():
+    from attendance_store import AttendanceLog
+    return AttendanceLog()
+
+
+@st.cache_resource
+def attendance_writer():
+    """Background writer the camera loop marks through, so it never waits on disk."""
+    from attendance_writer import AttendanceWriter
+    return AttendanceWriter(attendance_log())
+
+
+def attendance_frame(rows):
+    """Table of (name, time, day) records with a typed Date column."""
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=['Name', 'Time', 'Date'])
+    df['Date'] = pd.to_datetime(df['Date']).dt.date
+    return df
+
+
+@st.cache_resource
+def attendance_archive():
+    from archive import AttendanceArchive
+    return AttendanceArchive()
+
+
+@st.cache_data(show_spinner=False)
+def attendance_export(name, day, version):
+    """Stream the matching records from the monthly archive into a CSV file and return its path."""
+    # version is only part of the cache key, so the export is rebuilt whenever a record is added
+    import hashlib
+    import tempfile
+    archive = attendance_archive()
+    archive.update(attendance_log())
+    key = hashlib.sha1(repr((name, day)).encode()).hexdigest()[:12]
+    export_path = os.path.join(tempfile.gettempdir(), f'attendance_export_{key}.csv')
+    with open(export_path + '.tmp', 'w', newline='') as f:
+        archive.export_csv(f, start=day, end=day, names={name} if name else None)
+    os.replace(export_path + '.tmp', export_path)
+    return export_path
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def prepare_upload(data):
+    """Validate, crop and encode an uploaded photo once, however often the page reruns."""
+    from registration import prepare_photo
+    return prepare_photo(data)
+
+
+def invalidate_roster():
+    registered_users.clear()
+    user_thumbnails.clear()
+    load_roster.clear()
+
+
 # Check if Register_Data exists and has files
-if os.path.exists(path):
-    myList = os.listdir(path)
-else:
-    myList = []
+myList = registered_users()
 
 # Main content based on menu selection
 if choice == "🏠 Home":
@@ -310,58 +436,44 @@ elif choice == "📸 Mark Attendance":
         if st.button("Stop and Reset"):
             run = False
             st.rerun()
+        
+        if st.button("Reload Registered Faces"):
+            invalidate_roster()
+            st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Recent activity
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("Recent Activity")
-        try:
-            df = pd.read_csv('Attendance_Sheet.csv')
-            if len(df) > 0:
-                st.write(df.tail(3))
-            else:
-                st.write("No records yet.")
-        except:
+        recent = attendance_log().analytics.records(limit=3)
+        if recent:
+            st.write(attendance_frame(recent))
+        else:
             st.write("No records yet.")
         st.markdown('</div>', unsafe_allow_html=True)
     
     if run:
-        # Load registered faces
-        for cl in myList:
-            curlImg = cv2.imread(f'{path}/{cl}')
-            images.append(curlImg)
-            classNames.append(os.path.splitext(cl)[0])
-        
-        def findEncodings(images):
-            encodeList = []
-            for img in images:
-                img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-                try:
-                    encode = face_recognition.face_encodings(img)[0]
-                    encodeList.append(encode)
-                except:
-                    st.error(f"No face found in one of the images. Please check your registered images.")
-            return encodeList
+        import cv2
+        import pandas as pd
+        from recognition import FrameRecognizer, markable
+        from pipeline import RecognitionPipeline
+        from tracking import TrackingRecognizer
+        from scheduler import DetectionScheduler
+        from motion import MotionGate, MotionGatedRecognizer
+        from mark_cache import MarkedTodayCache
+        from overlay import draw_face, draw_timestamp
+        from metrics import LIVE_WINDOW, NULL_METRICS, Metrics
+        from quality import QualityGate
         
-        def markAttendance(name):
-            with open('Attendance_Sheet.csv', 'r+') as f:
-                myDataList = f.readlines()
-                nameList = []
-                for line in myDataList:
-                    entry = line.split(',')
-                    nameList.append(entry[0])
-                if name not in nameList:
-                    now = datetime.now()
-                    dtString = now.strftime('%H:%M:%S')
-                    dStr = now.strftime('%d:%m:%Y')
-                    f.writelines(f'\n{name},{dtString},{dStr}')
-                    return True
-                return False
+        # Load registered faces from the encoding store, encoding only new or changed photos
+        with st.spinner("Loading facial recognition model..."):
+            matcher, failed = load_roster()
+            watcher = roster_watcher()
+        for file in failed:
+            st.error(f"No face found in {file}. Please check your registered images.")
         
-        if images:
-            with st.spinner("Loading facial recognition model..."):
-                encodeListKnown = findEncodings(images)
-                st.success("Facial recognition model loaded successfully!")
+        if len(matcher):
+            st.success("Facial recognition model loaded successfully!")
             
             cap = cv2.VideoCapture(0)
             
@@ -369,76 +481,111 @@ elif choice == "📸 Mark Attendance":
             cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
             
-            attendance_marked = False
+            # Stage timings are only collected while the performance panel is shown
+            metrics = Metrics(window=LIVE_WINDOW) if show_performance else NULL_METRICS
+            metrics.gauge('roster_size', len(matcher))
+            perf_panel = st.sidebar.empty()
+            panel_refreshed = 0.0
             
-            while run:
-                success, img = cap.read()
-                if not success:
-                    st.error("Failed to access camera. Please check your camera connection.")
-                    break
-                
-                # Resize for faster processing
-                imgS = cv2.resize(img, (0, 0), None, 0.25, 0.25)
-                imgS = cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
-                
-                faceCurFrame = face_recognition.face_locations(imgS)
-                encodeCurFrame = face_recognition.face_encodings(imgS, faceCurFrame)
-                
-                # Add timestamp to image
-                now = datetime.now()
-                timestamp = now.strftime("%d/%m/%Y %H:%M:%S")
-                cv2.putText(img, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                
-                for encodeFace, faceLoc in zip(encodeCurFrame, faceCurFrame):
-                    matches = face_recognition.compare_faces(encodeListKnown, encodeFace)
-                    faceDis = face_recognition.face_distance(encodeListKnown, encodeFace)
-                    
-                    if len(faceDis) > 0:
-                        matchIndex = np.argmin(faceDis)
-                        
-                        y1, x2, y2, x1 = faceLoc
-                        y1, x2, y2, x1 = y1*4, x2*4, y2*4, x1*4
-                        
-                        if matches[matchIndex]:
-                            name = classNames[matchIndex].upper()
-                            # Create a nicer looking rectangle
-                            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                            
-                            # Add a background for the name
-                            cv2.rectangle(img, (x1, y2-40), (x2, y2), (0, 255, 0), cv2.FILLED)
-                            cv2.putText(img, name, (x1+6, y2-10), cv2.FONT_HERSHEY_COMPLEX, 0.8, (255, 255, 255), 2)
-                            
-                            # Show confidence
-                            confidence = round((1 - faceDis[matchIndex]) * 100, 2)
-                            cv2.putText(img, f"Conf: {confidence}%", (x1+6, y2-65), cv2.FONT_HERSHEY_COMPLEX, 0.5, (255, 255, 255), 1)
-                            
-                            # Mark attendance
-                            if confidence > 50:  # Only mark if confidence is good
-                                is_new = markAttendance(name)
-                                if is_new:
-                                    # Add a "Marked" indicator
-                                    cv2.putText(img, "ATTENDANCE MARKED", (x1, y1-10), cv2.FONT_HERSHEY_COMPLEX, 0.7, (0, 255, 0), 2)
-                                    attendance_marked = True
-                        else:
-                            # Unknown face
-                            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                            cv2.rectangle(img, (x1, y2-40), (x2, y2), (0, 0, 255), cv2.FILLED)
-                            cv2.putText(img, "Unknown", (x1+6, y2-10), cv2.FONT_HERSHEY_COMPLEX, 0.8, (255, 255, 255), 2)
-                
-                # Convert to RGB for display
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                FRAME_WINDOW.image(img)
-                
-                # If attendance was marked, pause briefly
-                if attendance_marked:
-                    time.sleep(2)
-                    attendance_marked = False
-                
-                # Add a small delay to reduce CPU usage
-                time.sleep(0.01)
+            def render_performance_panel(snapshot):
+                rates = snapshot['rates']
+                with perf_panel.container():
+                    st.markdown("### 📈 Performance")
+                    st.write(f"Display FPS: {rates.get('displayed', 0):.1f}")
+                    st.write(f"Recognition FPS: {rates.get('recognized', 0):.1f}")
+                    st.write(f"Dropped frames (never displayed or recognized): "
+                             f"{snapshot['gauges'].get('dropped_frames', 0)}")
+                    st.write(f"Faces skipped for quality: {snapshot['counters'].get('low_quality', 0)}")
+                    st.write(f"Roster size: {snapshot['gauges'].get('roster_size', 0)} "
+                             f"({snapshot['gauges'].get('roster_reloads', 0)} live reload(s))")
+                    st.write(f"Attendance queue: {snapshot['gauges'].get('attendance_pending', 0)} pending, "
+                             f"last commit {snapshot['gauges'].get('attendance_commit_ms', 0):.1f} ms")
+                    if snapshot['stages']:
+                        stages = pd.DataFrame(snapshot['stages']).T
+                        st.dataframe(stages[['count', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms']].round(2))
+            
+            # Capture and recognition run on background threads; this loop only renders
+            scheduler = DetectionScheduler(adaptive=ADAPTIVE_DETECTION, budget=DETECT_BUDGET, detector=DETECTOR)
+            recognizer = FrameRecognizer(matcher, scheduler, metrics=metrics, num_jitters=NUM_JITTERS,
+                                         gate=QualityGate() if QUALITY_GATE else None)
+            # Tracks must see frames in order, so a single worker drives them
+            workers = 1 if TRACKING else None
+            if TRACKING:
+                recognizer = TrackingRecognizer(recognizer, DETECT_EVERY)
+            gate = None
+            if MOTION_GATE:
+                gate = MotionGate(sensitivity=MOTION_SENSITIVITY, max_idle=MOTION_MAX_IDLE)
+                recognizer = MotionGatedRecognizer(recognizer, gate, metrics=metrics)
+            pipeline = RecognitionPipeline(cap, recognizer, workers=workers, metrics=metrics).start()
+            attendance = attendance_writer()
+            # Identities already marked today survive page reruns within the session
+            if 'marked_cache' not in st.session_state:
+                st.session_state['marked_cache'] = MarkedTodayCache()
+            marked_cache = st.session_state['marked_cache']
+            frame_seq = 0
+            results_seq = 0
+            display = None
             
-            # Release the camera when done
-            cap.release()
+            try:
+                while run:
+                    frame_seq, img = pipeline.buffer.wait_newer(frame_seq, timeout=1.0)
+                    if pipeline.error:
+                        st.error(pipeline.error)
+                        break
+                    if img is None:
+                        continue
+                    # Convert into a reused display buffer: one pass replaces the copy and the RGB conversion,
+                    # and the capture frame shared with the recognition workers is never drawn on
+                    display = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=display)
+                    
+                    # Mark attendance once per recognized frame, not once per displayed frame
+                    now = datetime.now()
+                    seq, results = pipeline.latest_results()
+                    if seq != results_seq:
+                        results_seq = seq
+                        with metrics.stage('mark'):
+                            for result in results:
+                                # Only mark if confidence is good and they aren't already marked today
+                                if markable(result) and marked_cache.should_mark(result.name, now):
+                                    marked_cache.record(result.name, attendance.mark(result.name.upper(), now), now)
+                    
+                    with metrics.stage('draw'):
+                        # Add timestamp to image
+                        draw_timestamp(display, now, channels='RGB')
+                        for result in results:
+                            draw_face(display, result, marked=marked_cache.recently_marked(result.name, now),
+                                      channels='RGB')
+                    
+                    with metrics.stage('display'):
+                        FRAME_WINDOW.image(display)
+                    metrics.tick('displayed')
+                    
+                    # Nobody in front of the camera: refresh the preview less often
+                    if gate is not None and gate.idle:
+                        time.sleep(IDLE_FRAME_INTERVAL)
+                    
+                    if show_performance and time.monotonic() - panel_refreshed >= PANEL_REFRESH:
+                        panel_refreshed = time.monotonic()
+                        metrics.gauge('marked_today', len(marked_cache))
+                        metrics.gauge('dropped_frames', pipeline.buffer.dropped)
+                        metrics.gauge('roster_size', len(matcher))
+                        metrics.gauge('roster_reloads', watcher.reloads)
+                        writer_stats = attendance.stats()
+                        metrics.gauge('attendance_pending', writer_stats['pending'])
+                        metrics.gauge('attendance_overflow', writer_stats['overflow'])
+                        metrics.gauge('attendance_commit_ms', writer_stats['last_commit_ms'])
+                        render_performance_panel(metrics.snapshot())
+                        for export_path in METRICS_EXPORTS:
+                            metrics.export(export_path)
+            finally:
+                pipeline.stop()
+                attendance.flush(timeout=5)
+                if attendance.error:
+                    st.error(attendance.error)
+                if watcher.error:
+                    st.error(watcher.error)
+                # Release the camera when done
+                cap.release()
         else:
             st.warning("No registered faces found. Please register at least one face first.")
             if st.button("Go to Registration"):
@@ -452,46 +599,68 @@ elif choice == "👤 Register":
     
     with col1:
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.subheader("Upload Photo for Registration")
+        st.subheader("Upload Photos for Registration")
         
         # Name input
         name = st.text_input("Full Name (This will appear in attendance records)")
         
         # File uploader with instructions
         st.markdown("""
-        <p>Upload a clear facial photo:</p>
+        <p>Upload one or more clear facial photos:</p>
         <ul>
             <li>Face should be clearly visible</li>
             <li>Good lighting conditions</li>
             <li>Neutral expression recommended</li>
+            <li>A few photos in different lighting improve recognition</li>
             <li>Supported formats: JPG, JPEG, PNG</li>
         </ul>
         """, unsafe_allow_html=True)
         
-        image_file = st.file_uploader("", type=['png', 'jpeg', 'jpg'])
+        image_files = st.file_uploader("", type=['png', 'jpeg', 'jpg'], accept_multiple_files=True)
         
-        if image_file is not None:
-            # Preview the image
-            img = Image.open(image_file)
-            st.image(img, width=300, caption="Preview")
+        if image_files:
+            from registration import clean_name
+            # Photos are added to the person's folder, so registering again adds to their templates
+            name = clean_name(name)
+            
+            # Each photo is decoded, checked for exactly one face, cropped and encoded here
+            with st.spinner("Checking photos..."):
+                prepared = [prepare_upload(image_file.getvalue()) for image_file in image_files]
+            accepted = [photo for photo in prepared if photo.error is None]
             
-            if name:
-                # Save with the name instead of original filename
-                file_extension = os.path.splitext(image_file.name)[1]
-                new_filename = f"{name}{file_extension}"
-                
+            # Preview the normalized crops that will be stored
+            if accepted:
+                st.image([photo.image for photo in accepted], channels='BGR', width=150,
+                         caption=[image_file.name for image_file, photo in zip(image_files, prepared)
+                                  if photo.error is None])
+            for image_file, photo in zip(image_files, prepared):
+                if photo.error is not None:
+                    st.warning(f"{image_file.name}: {photo.error}. This photo will be skipped.")
+            
+            if not accepted:
+                st.error("None of the photos can be used. Please upload a clear photo showing only your face.")
+            elif name:
                 # Submit button
                 if st.button("Register User"):
-                    with open(os.path.join(path, new_filename), "wb") as f:
-                        f.write(image_file.getbuffer())
-                    st.success(f"✅ Successfully registered {name}!")
+                    from encoding_store import EncodingStore, store_lock
+                    from registration import register_photos
+                    from shared_roster import publish_roster
+                    from templates import MAX_TEMPLATES
+                    # Only the crops are saved, already encoded, so the camera page doesn't re-encode them
+                    with store_lock():
+                        store = EncodingStore()
+                        new_files = register_photos(path, store, name, accepted)
+                        # Cameras already running, in this or another process, pick the new roster up
+                        publish_roster(store, MAX_TEMPLATES)
+                    invalidate_roster()
+                    st.success(f"✅ Successfully registered {name} with {len(new_files)} photo(s)!")
                     
                     # Show a "Mark attendance now" button
                     if st.button("Mark Attendance Now"):
                         st.session_state['menu_selection'] = "📸 Mark Attendance"
                         st.rerun()
             else:
-                st.warning("Please enter your name before registering.")
+                st.warning("Please enter your name before registering (it can't start with a dot).")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
@@ -506,7 +675,8 @@ elif choice == "👤 Register":
         4. Use proper lighting
         5. Look directly at the camera
         
-        The system will use this image to identify you when marking attendance.
+        The system will use these images to identify you when marking attendance.
+        Registering again with the same name adds photos instead of replacing them.
         """)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -515,9 +685,12 @@ elif choice == "👤 Register":
         st.subheader("Registered Users")
         
         if myList:
-            for user in myList:
-                username = os.path.splitext(user)[0]
-                st.markdown(f"• {username}")
+            thumbnails = user_thumbnails()
+            for username in myList:
+                if username in thumbnails:
+                    st.image(thumbnails[username], width=48, caption=username)
+                else:
+                    st.markdown(f"• {username}")
         else:
             st.info("No users registered yet.")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -527,79 +700,78 @@ elif choice == "📊 Attendance Sheet":
     
     col1, col2 = st.columns([3, 1])
     
+    # Filters, tables and statistics are read from indexed queries and precomputed
+    # aggregates, so the page costs the same however long the history is
+    from analytics import RECENT_LIMIT
+    analytics = attendance_log().analytics
+    total_records, total_users = analytics.totals()
+    name_filter = date_filter = None
+    
     with col1:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("Attendance Sheet")
         
-        try:
-            df = pd.read_csv('Attendance_Sheet.csv')
+        if total_records:
+            # Provide filter options
+            name_choice = st.selectbox("Filter by Name", ['All'] + analytics.people())
+            date_choice = st.selectbox("Filter by Date", ['All'] + analytics.days())
+            name_filter = None if name_choice == 'All' else name_choice
+            date_filter = None if date_choice == 'All' else date_choice
             
-            # Data cleaning and enhancement
-            if len(df) > 0:
-                # Rename columns for better display
-                df.columns = ['Name', 'Time', 'Date']
-                
-                # Format the data
-                if 'Time' in df.columns:
-                    df['Time'] = df['Time'].astype(str)
-                if 'Date' in df.columns:
-                    df['Date'] = df['Date'].astype(str)
-                
-                # Add a status column (just for visual enhancement)
-                df['Status'] = 'Present'
-                
-                # Provide filter options
-                name_filter = st.selectbox("Filter by Name", ['All'] + list(df['Name'].unique()))
-                date_filter = st.selectbox("Filter by Date", ['All'] + list(df['Date'].unique()))
-                
-                filtered_df = df.copy()
-                if name_filter != 'All':
-                    filtered_df = filtered_df[filtered_df['Name'] == name_filter]
-                if date_filter != 'All':
-                    filtered_df = filtered_df[filtered_df['Date'] == date_filter]
-                
-                # Display the dataframe with some styling
-                st.dataframe(filtered_df, use_container_width=True)
-                
-                # Download options
-                csv = filtered_df.to_csv(index=False)
+            rows = analytics.records(name_filter, date_filter)
+            records_df = attendance_frame(rows)
+            # Add a status column (just for visual enhancement)
+            records_df['Status'] = 'Present'
+            if len(rows) == RECENT_LIMIT:
+                st.caption(f"Showing the latest {RECENT_LIMIT} records. Filter by name or date, "
+                           "or download the full records below.")
+            
+            # Display the dataframe with some styling
+            st.dataframe(records_df, use_container_width=True)
+            
+            # Download options
+            with open(attendance_export(name_filter, date_filter, analytics.version()), 'rb') as export_file:
                 st.download_button(
                     label="Download as CSV",
-                    data=csv,
+                    data=export_file,
                     file_name='attendance_records.csv',
                     mime='text/csv',
                 )
-            else:
-                st.info("No attendance records found.")
-        except Exception as e:
-            st.error(f"Error reading attendance sheet: {e}")
-            if not os.path.exists('Attendance_Sheet.csv'):
-                # Create the file if it doesn't exist
-                with open('Attendance_Sheet.csv', 'w') as f:
-                    f.write('NAME,TIME,DATE')
-                st.info("Created a new attendance sheet. No records yet.")
+        else:
+            st.info("No attendance records found.")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("Attendance Statistics")
         
-        try:
-            df = pd.read_csv('Attendance_Sheet.csv')
-            if len(df) > 0:
-                # Rename columns
-                df.columns = ['Name', 'Time', 'Date']
-                
-                # Display statistics
-                st.write(f"Total Records: {len(df)}")
-                st.write(f"Unique Users: {df['Name'].nunique()}")
-                
-                # Latest attendance
-                st.subheader("Latest Attendance")
-                st.write(df.tail(5)[['Name', 'Time', 'Date']])
-            else:
-                st.info("No data available for statistics.")
-        except:
+        if total_records:
+            # Display statistics
+            st.write(f"Total Records: {total_records}")
+            st.write(f"Unique Users: {total_users}")
+            daily = analytics.daily()
+            today = datetime.now().date().isoformat()
+            st.write(f"Present Today: {daily[-1][1] if daily and daily[-1][0] == today else 0}")
+            
+            if name_filter:
+                person = analytics.person(name_filter)
+                st.subheader(name_filter)
+                st.write(f"Days Attended: {person['count']}")
+                st.write(f"First Seen: {person['first_day']}")
+                st.write(f"Last Seen: {person['last_day']}")
+                st.write(f"Current Streak: {person['streak']} day(s)")
+                st.write(f"Best Streak: {person['best_streak']} day(s)")
+            
+            # Attendance per day over the last 30 days with records
+            st.subheader("Daily Attendance")
+            import pandas as pd
+            st.bar_chart(pd.DataFrame([count for _, count, _, _ in daily], columns=['Present'],
+                                      index=[day for day, _, _, _ in daily]))
+            
+            # Latest attendance
+            st.subheader("Latest Attendance")
+            st.write(attendance_frame(analytics.records(limit=5)))
+        else:
             st.info("No data available for statistics.")
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -617,7 +789,7 @@ elif choice == "ℹ️ Help":
         ### Step 1: Registration
         - Go to the **Register** section from the sidebar menu
         - Enter your full name
-        - Upload a clear photo of your face
+        - Upload one or more clear photos of your face
         - Click "Register User"
         
         ### Step 2: Mark Attendance
@@ -679,6 +851,7 @@ elif choice == "ℹ️ Help":
         - Position yourself directly facing the camera
         
         ### CSV File Issues
+        - Attendance records are stored in attendance.db; Attendance_Sheet.csv is a copy kept for spreadsheets
         - Do not manually edit the Attendance_Sheet.csv file
         - If the file becomes corrupted, you can delete it and a new one will be created automatically
         
@@ -0,0 +1,175 @@
+"""Precomputed attendance aggregates kept next to the attendance records.
+
+Every record carries a typed ISO ``day`` column (indexed), and two summary
+tables are updated in the same transaction as each batch of new marks:
+
+- ``daily_stats``: records, first and last time per day
+- ``person_stats``: days attended, first and last day seen, and the streak
+  of consecutive days ending on the last day seen and the best streak per person
+
+so the attendance sheet reads a bounded number of rows however long the
+history is. ``rebuild`` recomputes both tables from the records.
+"""
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+
+# Bumped when the schema below changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 1
+# Records shown on the sheet when no filter narrows them down
+RECENT_LIMIT = 500
+
+SCHEMA = '''
+CREATE INDEX IF NOT EXISTS attendance_day ON attendance (day);
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    first_time TEXT NOT NULL,
+    last_time TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS person_stats (
+    name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    first_day TEXT NOT NULL,
+    last_day TEXT NOT NULL,
+    streak INTEGER NOT NULL,
+    best_streak INTEGER NOT NULL);
+'''
+
+
+def iso_day(date_text, date_format):
+    """Convert a sheet date such as '18:10:2026' to '2026-10-18', or None if malformed."""
+    try:
+        return datetime.strptime(date_text, date_format).date().isoformat()
+    except ValueError:
+        return None
+
+
+def streaks(days):
+    """Return (current, best) runs of consecutive days in a sorted list of ISO days."""
+    current = best = 0
+    previous = None
+    for day in map(date.fromisoformat, days):
+        current = current + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        best = max(best, current)
+        previous = day
+    return current, best
+
+
+class AttendanceAnalytics:
+    """Maintains and queries the summary tables of an attendance database.
+
+    Queries hold ``lock`` (the lock guarding ``conn``). ``record`` and
+    ``rebuild`` run inside the caller's transaction and under its lock.
+    """
+
+    def __init__(self, conn, lock=None):
+        self._conn = conn
+        self._lock = lock or nullcontext()
+
+    def _query(self, query, params=()):
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def ensure_schema(self):
+        """Create the summary tables, rebuilding them on first use (inside the caller's transaction)."""
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        for statement in SCHEMA.split(';'):
+            if statement.strip():
+                self._conn.execute(statement)
+        self.rebuild()
+        self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def rebuild(self):
+        self._conn.execute('DELETE FROM daily_stats')
+        self._conn.execute('''INSERT INTO daily_stats (day, count, first_time, last_time)
+            SELECT day, COUNT(*), MIN(time), MAX(time) FROM attendance WHERE day IS NOT NULL GROUP BY day''')
+        self._conn.execute('DELETE FROM person_stats')
+        cursor = self._conn.execute('SELECT DISTINCT name FROM attendance WHERE day IS NOT NULL')
+        for name in [name for (name,) in cursor]:
+            self._rebuild_person(name)
+
+    def _rebuild_person(self, name):
+        days = [day for (day,) in self._conn.execute(
+            'SELECT day FROM attendance WHERE name = ? AND day IS NOT NULL ORDER BY day', (name,))]
+        if not days:
+            self._conn.execute('DELETE FROM person_stats WHERE name = ?', (name,))
+            return
+        current, best = streaks(days)
+        self._conn.execute('INSERT OR REPLACE INTO person_stats VALUES (?, ?, ?, ?, ?, ?)',
+                           (name, len(days), days[0], days[-1], current, best))
+
+    def record(self, rows):
+        """Fold newly inserted (name, time, day) rows into the summary tables."""
+        for name, time_, day in rows:
+            self._conn.execute('''INSERT INTO daily_stats (day, count, first_time, last_time) VALUES (?, 1, ?, ?)
+                ON CONFLICT (day) DO UPDATE SET count = count + 1,
+                    first_time = MIN(first_time, excluded.first_time),
+                    last_time = MAX(last_time, excluded.last_time)''', (day, time_, time_))
+            person = self._conn.execute(
+                'SELECT count, first_day, last_day, streak, best_streak FROM person_stats WHERE name = ?',
+                (name,)).fetchone()
+            if person is None:
+                self._conn.execute('INSERT INTO person_stats VALUES (?, 1, ?, ?, 1, 1)', (name, day, day))
+                continue
+            count, _, last_day, streak, best = person
+            if day <= last_day:
+                # A back-dated record can join or split earlier streaks: recount this person
+                self._rebuild_person(name)
+                continue
+            gap = date.fromisoformat(day) - date.fromisoformat(last_day)
+            streak = streak + 1 if gap == timedelta(days=1) else 1
+            self._conn.execute('UPDATE person_stats SET count = ?, last_day = ?, streak = ?, best_streak = ? '
+                               'WHERE name = ?', (count + 1, day, streak, max(best, streak), name))
+
+    def totals(self):
+        """Return (records, people)."""
+        return self._query('SELECT COALESCE(SUM(count), 0), COUNT(*) FROM person_stats')[0]
+
+    def people(self):
+        return [name for (name,) in self._query('SELECT name FROM person_stats ORDER BY name')]
+
+    def days(self):
+        """Days with at least one record, newest first."""
+        return [day for (day,) in self._query('SELECT day FROM daily_stats ORDER BY day DESC')]
+
+    def person(self, name, today=None):
+        """Return {count, first_day, last_day, streak, best_streak} for ``name``, or None.
+
+        ``streak`` is the current streak as of ``today`` (default: the local date):
+        0 once a day has been missed since ``last_day``.
+        """
+        rows = self._query('SELECT count, first_day, last_day, streak, best_streak FROM person_stats '
+                           'WHERE name = ?', (name,))
+        if not rows:
+            return None
+        person = dict(zip(('count', 'first_day', 'last_day', 'streak', 'best_streak'), rows[0]))
+        today = today or date.today()
+        if today - date.fromisoformat(person['last_day']) > timedelta(days=1):
+            person['streak'] = 0
+        return person
+
+    def daily(self, limit=30):
+        """Return (day, count, first_time, last_time) for the latest ``limit`` days, oldest first."""
+        rows = self._query('SELECT day, count, first_time, last_time FROM daily_stats '
+                           'ORDER BY day DESC LIMIT ?', (limit,))
+        return rows[::-1]
+
+    def records(self, name=None, day=None, limit=RECENT_LIMIT):
+        """Return (name, time, day) records, newest first, using the name and day indexes."""
+        clauses, params = [], []
+        if name is not None:
+            clauses.append('name = ?')
+            params.append(name)
+        if day is not None:
+            clauses.append('day = ?')
+            params.append(day)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        query = f'SELECT name, time, day FROM attendance {where} ORDER BY id DESC'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        return self._query(query, params)
+
+    def version(self):
+        """Changes whenever a record is added; usable as a cache key."""
+        return self._query('SELECT MAX(id) FROM attendance')[0][0]
@@ -0,0 +1,195 @@
+"""Nearest-neighbour index layer used by the matcher.
+
+Two interchangeable indexes share the same ``search`` interface:
+
+- ``BruteForceIndex`` scans every known encoding (exact, fine for small rosters)
+- ``IVFIndex`` partitions the encodings with k-means and only scans the
+  ``nprobe`` partitions closest to each query, so lookup cost is sublinear in
+  roster size. Raising ``nprobe`` trades latency for recall.
+
+The indexed rows are the per-identity templates built by ``templates``. The
+IVF index is saved next to the encoding store and kept in step with it using
+the templates' row keys, so registering or removing a user only assigns the
+changed rows to a partition instead of retraining.
+"""
+import os
+import threading
+
+import numpy as np
+
+INDEX_FILE = 'ivf_index.npz'
+# Below this roster size a brute-force scan is faster than probing partitions
+IVF_MIN_SIZE = 2048
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 10
+# Retrain the partitions once the roster has grown this much since training
+RETRAIN_GROWTH = 4
+CHUNK_SIZE = 4096
+
+
+def _squared_distances(queries, vectors, norms):
+    return (np.einsum('ij,ij->i', queries, queries)[:, np.newaxis]
+            - 2.0 * (queries @ vectors.T) + norms[np.newaxis, :])
+
+
+def _nearest_centroids(vectors, centroids):
+    # Chunked so large rosters don't materialise an n x n_lists matrix at once
+    norms = np.einsum('ij,ij->i', centroids, centroids)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), CHUNK_SIZE):
+        chunk = vectors[start:start + CHUNK_SIZE]
+        assignments[start:start + len(chunk)] = np.argmin(_squared_distances(chunk, centroids, norms), axis=1)
+    return assignments
+
+
+def kmeans(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Train ``n_lists`` centroids with Lloyd's algorithm on a sample of rows."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), 256 * n_lists)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_lists)
+        # Empty partitions keep their previous centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+    return centroids
+
+
+class BruteForceIndex:
+    """Exact search over every known encoding."""
+
+    kind = 'flat'
+
+    def __init__(self, vectors):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries):
+        """Return the index of and distance to the nearest vector per query."""
+        # |k|^2 - 2 q.k ranks the known encodings; |q|^2 is constant per query
+        scores = self.norms[np.newaxis, :] - 2.0 * (queries @ self.vectors.T)
+        indices = np.argmin(scores, axis=1)
+        # Recompute the winning distance exactly to avoid float32 cancellation
+        distances = np.linalg.norm(queries - self.vectors[indices], axis=1)
+        return indices, distances
+
+
+class IVFIndex:
+    """Inverted-file index over k-means partitions of the known encodings."""
+
+    kind = 'ivf'
+
+    def __init__(self, vectors, centroids=None, nprobe=DEFAULT_NPROBE, keys=None):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.nprobe = nprobe
+        self.keys = list(keys) if keys is not None else []
+        if centroids is None:
+            centroids = kmeans(self.vectors, max(1, min(len(self.vectors), int(4 * np.sqrt(len(self.vectors))))))
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.trained_size = len(self.vectors)
+        self.assignments = _nearest_centroids(self.vectors, self.centroids)
+        self._build_lists()
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _build_lists(self):
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        self.centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+    def search(self, queries):
+        """Return the index of and distance to the nearest vector per query.
+
+        Only the ``nprobe`` partitions closest to each query are scanned, so
+        results are approximate; ``nprobe >= len(centroids)`` is exact.
+        """
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_scores = _squared_distances(queries, self.centroids, self.centroid_norms)
+        probes = np.argpartition(centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        indices = np.full(len(queries), -1)
+        distances = np.full(len(queries), np.inf)
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([self.lists[list_id] for list_id in probes[i]])
+            if len(candidates) == 0:
+                continue
+            candidate_distances = np.linalg.norm(self.vectors[candidates] - query, axis=1)
+            best = np.argmin(candidate_distances)
+            indices[i] = candidates[best]
+            distances[i] = candidate_distances[best]
+        return indices, distances
+
+    def save(self, path):
+        # Matchers in several processes and threads may save at once: each writes its own
+        # temporary file, and the last complete one wins
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments,
+                     keys=np.array(self.keys), trained_size=self.trained_size)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, vectors, keys, nprobe=DEFAULT_NPROBE):
+        """Load saved partitions and bring them in step with ``vectors``.
+
+        Rows whose key was saved keep their partition, so only added or
+        changed rows are assigned and removed rows simply drop out. The
+        partitions are retrained once the roster has outgrown them.
+        Returns the index and whether it changed and should be saved.
+        """
+        saved = np.load(path)
+        saved_keys = list(saved['keys'])
+        trained_size = int(saved['trained_size'])
+        if len(vectors) > RETRAIN_GROWTH * max(trained_size, 1):
+            return cls(vectors, nprobe=nprobe, keys=keys), True
+        index = cls.__new__(cls)
+        index.nprobe = nprobe
+        index.centroids = saved['centroids']
+        index.trained_size = trained_size
+        saved_rows = {key: row for row, key in enumerate(saved_keys)}
+        rows = np.array([saved_rows.get(key, -1) for key in keys], dtype=np.int64)
+        known = rows >= 0
+        index.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        index.assignments = np.empty(len(rows), dtype=np.int32)
+        index.assignments[known] = saved['assignments'][rows[known]]
+        if not known.all():
+            index.assignments[~known] = _nearest_centroids(index.vectors[~known], index.centroids)
+        index.keys = list(keys)
+        index._build_lists()
+        return index, index.keys != saved_keys
+
+
+def index_for_roster(roster, store_dir, kind='auto', nprobe=DEFAULT_NPROBE):
+    """Return the index to match against ``roster``, loading or updating its saved copy.
+
+    ``kind`` is ``'flat'``, ``'ivf'`` or ``'auto'`` (IVF once the roster
+    reaches ``IVF_MIN_SIZE`` templates).
+    """
+    size = len(roster.keys)
+    if kind == 'flat' or size == 0 or (kind == 'auto' and size < IVF_MIN_SIZE):
+        return BruteForceIndex(roster.encodings)
+    path = os.path.join(store_dir, INDEX_FILE)
+    if os.path.exists(path):
+        index, changed = IVFIndex.load(path, roster.encodings, roster.keys, nprobe=nprobe)
+    else:
+        index, changed = IVFIndex(roster.encodings, nprobe=nprobe, keys=roster.keys), True
+    if changed:
+        index.save(path)
+    return index
+
+
+def update_saved_index(roster, store_dir):
+    """Bring a previously saved IVF index up to date after the roster changed."""
+    path = os.path.join(store_dir, INDEX_FILE)
+    if os.path.exists(path) and roster.keys:
+        index, changed = IVFIndex.load(path, roster.encodings, roster.keys)
+        if changed:
+            index.save(path)
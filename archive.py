@@ -0,0 +1,204 @@
+"""Columnar, month-partitioned archive of the attendance records.
+
+Records are copied from the attendance database into one compressed NumPy
+file per month (``Attendance_Archive/2026-10.npz``). Each partition stores
+its columns as typed arrays: record id, a small name dictionary with an
+int32 code per record, the day as ``datetime64[D]`` and the time as seconds
+since midnight. ``manifest.json`` lists every partition with its date range
+and the names it contains, so range and name queries only open the
+partitions that can match. Updates are incremental: only records added
+since the last update are read, and only the months they fall in are
+rewritten.
+
+Usage::
+
+    python -m archive [--from 2026-01-01] [--to 2026-03-31] [--name ALICE] [--csv export.csv]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from attendance_store import DB_FILE, AttendanceLog
+
+ARCHIVE_DIR = 'Attendance_Archive'
+MANIFEST_FILE = 'manifest.json'
+# Records read from the database per query while updating
+CHUNK_SIZE = 10000
+EXPORT_HEADER = ['Name', 'Time', 'Date', 'Status']
+
+RECORD_DTYPE = [('id', 'i8'), ('name_id', 'i4'), ('day', 'M8[D]'), ('seconds', 'i4')]
+
+
+def _seconds(time_text):
+    hours, minutes, seconds = (int(part) for part in time_text.split(':'))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _time_text(seconds):
+    return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+class AttendanceArchive:
+    """Monthly partitions of attendance records with a manifest."""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self.partitions = {}
+        self.last_id = 0
+        self._lock = threading.Lock()
+        manifest_path = os.path.join(archive_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.partitions = manifest['partitions']
+            self.last_id = manifest['last_id']
+
+    def _path(self, month):
+        return os.path.join(self.archive_dir, f'{month}.npz')
+
+    def load(self, month):
+        """Return (names, records) for a month, or empty arrays if it has no partition."""
+        if month not in self.partitions:
+            return np.array([], dtype=str), np.zeros(0, dtype=RECORD_DTYPE)
+        with np.load(self._path(month)) as partition:
+            records = np.zeros(len(partition['id']), dtype=RECORD_DTYPE)
+            for field, _ in RECORD_DTYPE:
+                records[field] = partition[field]
+            return partition['names'], records
+
+    def _save(self, month, names, records):
+        path = self._path(month)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, names=names, **{field: records[field] for field, _ in RECORD_DTYPE})
+        os.replace(path + '.tmp', path)
+        self.partitions[month] = {
+            'file': os.path.basename(path),
+            'rows': len(records),
+            'first_day': str(records['day'].min()),
+            'last_day': str(records['day'].max()),
+            'names': names.tolist(),
+        }
+
+    def _save_manifest(self):
+        path = os.path.join(self.archive_dir, MANIFEST_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'last_id': self.last_id, 'partitions': self.partitions}, f)
+        os.replace(path + '.tmp', path)
+
+    def update(self, log):
+        """Append the records added to ``log`` since the last update; returns how many."""
+        log.flush()
+        with self._lock:
+            return self._update(log)
+
+    def _update(self, log):
+        archived_id = self.last_id
+        by_month = defaultdict(list)
+        added = 0
+        while True:
+            rows = log.records_after(self.last_id, CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                by_month[row[3][:7]].append(row)
+            self.last_id = rows[-1][0]
+            added += len(rows)
+        if not added:
+            return 0
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for month, rows in by_month.items():
+            old_names, records = self.load(month)
+            # Rows left over from an update interrupted before its manifest was saved
+            records = records[records['id'] <= archived_id]
+            names = np.union1d(old_names, [name for _, name, _, _ in rows])
+            # Codes follow the sorted dictionary, so existing records are re-coded through it
+            records['name_id'] = np.searchsorted(names, old_names[records['name_id']])
+            new = np.zeros(len(rows), dtype=RECORD_DTYPE)
+            new['id'] = [row[0] for row in rows]
+            new['name_id'] = np.searchsorted(names, [row[1] for row in rows])
+            new['day'] = [row[3] for row in rows]
+            new['seconds'] = [_seconds(row[2]) for row in rows]
+            self._save(month, names, np.concatenate([records, new]))
+        # The manifest is written last, so an interrupted update is simply redone
+        self._save_manifest()
+        return added
+
+    def months(self, start=None, end=None, names=None):
+        """Months whose partitions can hold records in [start, end] for ``names``."""
+        wanted = set(names) if names is not None else None
+        return sorted(month for month, meta in self.partitions.items()
+                      if (start is None or meta['last_day'] >= start)
+                      and (end is None or meta['first_day'] <= end)
+                      and (wanted is None or not wanted.isdisjoint(meta['names'])))
+
+    def query(self, start=None, end=None, names=None):
+        """Yield (names, records) per matching partition, filtered to the range and names.
+
+        ``start`` and ``end`` are inclusive ISO dates; ``names`` is a set of names.
+        """
+        for month in self.months(start, end, names):
+            month_names, records = self.load(month)
+            keep = np.ones(len(records), dtype=bool)
+            if start is not None:
+                keep &= records['day'] >= np.datetime64(start)
+            if end is not None:
+                keep &= records['day'] <= np.datetime64(end)
+            if names is not None:
+                keep &= np.isin(records['name_id'], np.flatnonzero(np.isin(month_names, list(names))))
+            if keep.any():
+                yield month_names, records[keep]
+
+    def rows(self, start=None, end=None, names=None):
+        """Yield (name, time, day) tuples in record order within each month."""
+        for month_names, records in self.query(start, end, names):
+            records = records[np.argsort(records['id'], kind='stable')]
+            for name_id, day, seconds in zip(records['name_id'], records['day'], records['seconds']):
+                yield str(month_names[name_id]), _time_text(int(seconds)), str(day)
+
+    def export_csv(self, f, start=None, end=None, names=None):
+        """Stream matching records as CSV to the open text file ``f``, one row at a time."""
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(EXPORT_HEADER)
+        count = 0
+        for name, time_, day in self.rows(start, end, names):
+            writer.writerow((name, time_, day, 'Present'))
+            count += 1
+        return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the attendance archive and query it.")
+    parser.add_argument('--db', default=DB_FILE, help="attendance database to archive")
+    parser.add_argument('--archive', default=ARCHIVE_DIR, help="archive directory")
+    parser.add_argument('--from', dest='start', help="first day (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', help="last day (YYYY-MM-DD)")
+    parser.add_argument('--name', action='append', help="only this person (repeatable)")
+    parser.add_argument('--csv', metavar='PATH', help="export matching records as CSV ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    archive = AttendanceArchive(args.archive)
+    log = AttendanceLog(args.db, csv_path=None)
+    try:
+        added = archive.update(log)
+    finally:
+        log.close()
+    names = set(args.name) if args.name else None
+    print(f"Archived {added} new record(s); {len(archive.partitions)} partition(s), "
+          f"{len(archive.months(args.start, args.end, names))} matching.", file=sys.stderr)
+    if args.csv == '-':
+        archive.export_csv(sys.stdout, args.start, args.end, names)
+    elif args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            count = archive.export_csv(f, args.start, args.end, names)
+        print(f"Wrote {count} record(s) to {args.csv}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Attendance storage engine.
+
+Records live in a SQLite database in WAL mode with a UNIQUE (name, date)
+constraint, so a person is recorded at most once per day. An in-memory set
+of the (name, date) pairs already recorded answers the duplicate check in
+O(1) without touching disk, and inserts are committed in batches.
+
+Each record also stores its day as an ISO date (indexed), and the summary
+tables in ``analytics`` are updated in the same transaction as the inserts.
+
+Several processes on the same host (app sessions, the service, batch
+jobs) can write to the same database: write transactions start with BEGIN
+IMMEDIATE and wait up to ``BUSY_TIMEOUT`` seconds for each other, and
+INSERT OR IGNORE on the UNIQUE constraint decides which process recorded a
+person first. The in-memory set only knows this process's marks, so the
+database has the final say on whether a record is new. WAL mode relies on
+shared memory between the processes, so the database must not be shared
+between hosts over a network filesystem; kiosks on different machines need
+their own databases.
+
+Attendance_Sheet.csv is kept as an append-only mirror for compatibility:
+each committed batch is appended to it while holding both the database
+write lock and a file lock.
+"""
+import csv
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from analytics import AttendanceAnalytics, iso_day
+from locking import FileLock
+
+DB_FILE = 'attendance.db'
+CSV_FILE = 'Attendance_Sheet.csv'
+CSV_HEADER = 'NAME,TIME,DATE'
+TIME_FORMAT = '%H:%M:%S'
+DATE_FORMAT = '%d:%m:%Y'
+# Commit after this many new marks or this many seconds, whichever comes first
+COMMIT_EVERY = 20
+COMMIT_INTERVAL = 1.0
+# Seconds a writer waits for another process's write transaction
+BUSY_TIMEOUT = 30.0
+
+
+class AttendanceLog:
+    """Per-day deduplicated attendance records backed by SQLite."""
+
+    def __init__(self, db_path=DB_FILE, csv_path=CSV_FILE,
+                 commit_every=COMMIT_EVERY, commit_interval=COMMIT_INTERVAL):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        created = not os.path.exists(db_path)
+        # Autocommit mode: every write goes through _transaction()
+        self._conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            time TEXT NOT NULL,
+            date TEXT NOT NULL,
+            day TEXT,
+            UNIQUE (name, date))''')
+        self._lock = threading.Lock()
+        self._csv_lock = FileLock(csv_path) if csv_path else None
+        self.analytics = AttendanceAnalytics(self._conn, self._lock)
+        self._seen = set()
+        self._loaded_dates = set()
+        self._pending = []
+        self._last_commit = time.monotonic()
+        with self._transaction():
+            if created and csv_path and os.path.exists(csv_path):
+                self._import_csv(csv_path)
+            self._add_day_column()
+            self.analytics.ensure_schema()
+
+    @contextmanager
+    def _transaction(self):
+        # Take the write lock up front: a deferred transaction that later needs to
+        # write can fail with "database is locked" instead of waiting its turn
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def _add_day_column(self):
+        # Databases created before the typed day column get it filled in once
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(attendance)')]
+        if 'day' in columns:
+            return
+        self._conn.execute('ALTER TABLE attendance ADD COLUMN day TEXT')
+        rows = self._conn.execute('SELECT id, date FROM attendance').fetchall()
+        self._conn.executemany('UPDATE attendance SET day = ? WHERE id = ?',
+                               [(iso_day(date, DATE_FORMAT), id_) for id_, date in rows])
+
+    def _import_csv(self, csv_path):
+        # Carry over the history recorded before the database existed
+        with open(csv_path, newline='') as f:
+            rows = [row[:3] for row in csv.reader(f) if len(row) >= 3]
+        if rows and ','.join(rows[0]).upper() == CSV_HEADER:
+            rows = rows[1:]
+        self._conn.executemany('INSERT OR IGNORE INTO attendance (name, time, date, day) VALUES (?, ?, ?, ?)',
+                               [(name, time_, date, iso_day(date, DATE_FORMAT)) for name, time_, date in rows])
+
+    def _load_date(self, date):
+        # Only the days actually being marked are pulled into the index
+        cursor = self._conn.execute('SELECT name FROM attendance WHERE date = ?', (date,))
+        self._seen.update((name, date) for (name,) in cursor)
+        self._loaded_dates.add(date)
+
+    def marked_names(self, date):
+        """Names already recorded on ``date``."""
+        with self._lock:
+            if date not in self._loaded_dates:
+                self._load_date(date)
+            return [name for name, seen_date in self._seen if seen_date == date]
+
+    def mark(self, name, when=None):
+        """Record ``name`` for the day of ``when``; False if already recorded."""
+        when = when or datetime.now()
+        date = when.strftime(DATE_FORMAT)
+        with self._lock:
+            if date not in self._loaded_dates:
+                self._load_date(date)
+            if (name, date) in self._seen:
+                return False
+            self._seen.add((name, date))
+            self._pending.append((name, when.strftime(TIME_FORMAT), date, when.date().isoformat()))
+            if (len(self._pending) >= self.commit_every
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self._commit()
+            return True
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        self._last_commit = time.monotonic()
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        added = []
+        with self._transaction():
+            for row in rows:
+                # Ignored when another process recorded this person today first
+                cursor = self._conn.execute('INSERT OR IGNORE INTO attendance (name, time, date, day) '
+                                            'VALUES (?, ?, ?, ?)', row)
+                if cursor.rowcount:
+                    added.append(row)
+            self.analytics.record([(name, time_, day) for name, time_, _, day in added])
+            # Still inside the write transaction, so processes append to the sheet in commit order
+            if self.csv_path and added:
+                self._append_csv(added)
+
+    def sync(self):
+        """Force committed records to stable storage (checkpoint the WAL, fsync the CSV)."""
+        with self._lock:
+            self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+            if self.csv_path and os.path.exists(self.csv_path):
+                with open(self.csv_path, 'a') as f:
+                    os.fsync(f.fileno())
+
+    def _append_csv(self, rows):
+        with self._csv_lock:
+            if not os.path.exists(self.csv_path):
+                with open(self.csv_path, 'w') as f:
+                    f.write(CSV_HEADER)
+            # Same layout as the original sheet: each record starts on a new line, written in one call
+            with open(self.csv_path, 'a') as f:
+                f.write(''.join(f'\n{name},{time_},{date}' for name, time_, date, _ in rows))
+                f.flush()
+
+    def records_after(self, last_id, limit):
+        """Return up to ``limit`` (id, name, time, day) records with id > ``last_id``, in id order."""
+        with self._lock:
+            return self._conn.execute('SELECT id, name, time, day FROM attendance WHERE id > ? AND day IS NOT NULL '
+                                      'ORDER BY id LIMIT ?', (last_id, limit)).fetchall()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
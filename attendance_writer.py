@@ -0,0 +1,190 @@
+"""Asynchronous attendance writer.
+
+``AttendanceWriter.mark`` never touches the attendance database or the CSV
+sheet: it checks an in-memory set of the (name, date) pairs already marked,
+appends the mark to a local journal and queues it. A background thread
+commits the queue to the AttendanceLog in batches every ``flush_interval``
+seconds, forces the batch to disk and only then discards its journal
+entries. Marks still in the journal after a crash are replayed at the next
+start, so every accepted mark is recorded at least once; replayed
+duplicates are dropped by the log's UNIQUE (name, date) constraint.
+
+Each process journals to its own ``attendance.journal.<pid>`` file and
+holds a lock on it while running; at start a writer replays every journal
+whose owner is gone, so several processes can share a working directory.
+
+Queue depth, batch sizes, commit latency and overflows (more than
+``max_pending`` marks waiting, i.e. the disk is not keeping up) are exposed
+through ``stats()`` for the performance panel.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from attendance_store import DATE_FORMAT
+from locking import FileLock
+
+JOURNAL_FILE = 'attendance.journal'
+FLUSH_INTERVAL = 1.0
+# Marks waiting beyond this count as overflow; they are still journaled and kept
+MAX_PENDING = 1000
+
+
+class AttendanceWriter:
+    """Queues attendance marks and commits them on a background thread."""
+
+    def __init__(self, log, journal_path=JOURNAL_FILE, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.log = log
+        self.journal_prefix = journal_path
+        self.journal_path = f'{journal_path}.{os.getpid()}'
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.error = None
+        self._pending = deque()
+        self._seen = set()
+        self._loaded_dates = set()
+        self._in_flight = 0
+        self._closed = False
+        self._flush_requested = False
+        self._cond = threading.Condition()
+        self._stats = {'committed': 0, 'batches': 0, 'overflow': 0, 'last_batch': 0, 'last_commit_ms': 0.0}
+        self._replay()
+        self._owner = FileLock(self.journal_path)
+        self._owner.acquire()
+        self._load_date(datetime.now().strftime(DATE_FORMAT))
+        self._journal = open(self.journal_path, 'a')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _committing_path(self):
+        return self.journal_path + '.committing'
+
+    def _replay(self):
+        # Marks accepted before a crash but never confirmed on disk. A journal whose
+        # lock can be taken belongs to a process that is no longer running.
+        replayed = 0
+        for lock_path in glob.glob(glob.escape(self.journal_prefix) + '.*.lock'):
+            journal_path = lock_path[:-len('.lock')]
+            owner = FileLock(journal_path)
+            if not owner.acquire(blocking=False):
+                continue
+            paths = (journal_path + '.committing', journal_path)
+            for path in paths:
+                if not os.path.exists(path):
+                    continue
+                with open(path) as f:
+                    for line in f:
+                        try:
+                            name, when = json.loads(line)
+                        except ValueError:
+                            # A line torn by the crash
+                            continue
+                        self.log.mark(name, datetime.fromisoformat(when))
+                        replayed += 1
+            self.log.flush()
+            self.log.sync()
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            owner.release()
+            owner.remove()
+        self._stats['replayed'] = replayed
+
+    def _load_date(self, date):
+        self._seen.update((name, date) for name in self.log.marked_names(date))
+        self._loaded_dates.add(date)
+
+    def mark(self, name, when=None):
+        """Queue ``name`` for the day of ``when``; False if already marked.
+
+        Days are loaded from disk by the background thread, so until a new
+        day has been loaded a person's first mark is reported as new; the
+        log still drops it if another process already recorded it.
+        """
+        when = when or datetime.now()
+        date = when.strftime(DATE_FORMAT)
+        with self._cond:
+            if (name, date) in self._seen:
+                return False
+            self._seen.add((name, date))
+            self._journal.write(json.dumps([name, when.isoformat()]) + '\n')
+            # Into the OS page cache, so a crash of this process loses nothing
+            self._journal.flush()
+            self._pending.append((name, when))
+            if len(self._pending) > self.max_pending:
+                self._stats['overflow'] += 1
+            return True
+
+    def _run(self):
+        while True:
+            today = datetime.now().strftime(DATE_FORMAT)
+            if today not in self._loaded_dates:
+                names = self.log.marked_names(today)
+                with self._cond:
+                    self._seen.update((name, today) for name in names)
+                    self._loaded_dates.add(today)
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._flush_requested, self.flush_interval)
+                self._flush_requested = False
+                if not self._pending:
+                    if self._closed:
+                        return
+                    continue
+                batch = list(self._pending)
+                self._pending.clear()
+                self._in_flight = len(batch)
+                # New marks go to a fresh journal while this batch is committed
+                self._journal.close()
+                os.replace(self.journal_path, self._committing_path())
+                self._journal = open(self.journal_path, 'a')
+            start = time.perf_counter()
+            try:
+                for name, when in batch:
+                    self.log.mark(name, when)
+                self.log.flush()
+                self.log.sync()
+                os.remove(self._committing_path())
+            except Exception as e:
+                # The batch stays in the committing journal and is replayed at the next start
+                self.error = f"Failed to write attendance: {e}"
+            with self._cond:
+                self._in_flight = 0
+                if self.error is None:
+                    self._stats['committed'] += len(batch)
+                    self._stats['batches'] += 1
+                    self._stats['last_batch'] = len(batch)
+                    self._stats['last_commit_ms'] = (time.perf_counter() - start) * 1000
+                self._cond.notify_all()
+            if self.error is not None:
+                return
+
+    def flush(self, timeout=None):
+        """Wait until every queued mark is on disk; False on timeout."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight
+                                       or self.error is not None, timeout)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending=len(self._pending) + self._in_flight)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._journal.close()
+        if self.error is None and os.path.exists(self.journal_path) and not os.path.getsize(self.journal_path):
+            os.remove(self.journal_path)
+            self._owner.release()
+            self._owner.remove()
+        else:
+            # Left for the next writer to replay
+            self._owner.release()
+        self.log.close()
@@ -0,0 +1,273 @@
+"""Offline batch mode and throughput benchmark.
+
+Runs the same detection -> encoding -> matching -> attendance logic as the
+camera loop over every frame of a video file or a directory of frames, and
+reports frames/sec, faces/sec and per-stage latency percentiles. Frames are
+processed in order without dropping, so runs over the same input are
+reproducible. Without tracking or the motion gate, ``--batch-size N`` encodes
+the faces of N consecutive frames in one network call. ``--detector`` picks
+the detector backend, and ``--compare-detectors`` times several backends on
+the same frames and reports each one's recall against the first.
+``--quality-gate`` skips faces too small, blurred or turned away to match
+before encoding them and reports how many were skipped.
+
+By default attendance goes to a throwaway in-memory database; pass
+``--db attendance.db`` to reprocess recorded footage into the real records.
+With ``--images`` other than Register_Data, the photos are encoded into a
+private store inside that directory (or ``--store``), so the roster used by
+the cameras is left alone.
+
+Usage::
+
+    python -m batch recordings/monday.mp4 [--tracking] [--adaptive] [--json report.json]
+    python -m batch frames/ --max-frames 500 --json -
+    python -m batch recordings/monday.mp4 --batch-size 8
+    python -m batch recordings/monday.mp4 --compare-detectors hog haar+hog ssd+hog ssd+landmarks
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import cv2
+
+from attendance_store import AttendanceLog
+from detectors import DEFAULT_DETECTOR, DETECTORS, make_detector
+from encoding_store import IMAGE_DIR, IMAGE_EXTENSIONS, EncodingStore, default_store_dir, store_lock
+from mark_cache import MarkedTodayCache
+from matcher import FaceMatcher
+from metrics import Metrics
+from motion import MotionGate, MotionGatedRecognizer
+from quality import QualityGate
+from recognition import NUM_JITTERS, FrameRecognizer, markable
+from scheduler import DETECT_BUDGET, DETECTION_SCALE, DetectionScheduler
+from tracking import DETECT_EVERY, TrackingRecognizer, iou
+
+
+def iter_frames(source, max_frames=None):
+    """Yield BGR frames from a video file or a directory of images (sorted by name)."""
+    count = 0
+    if os.path.isdir(source):
+        for file in sorted(os.listdir(source)):
+            if os.path.splitext(file)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            if max_frames is not None and count >= max_frames:
+                return
+            img = cv2.imread(os.path.join(source, file))
+            if img is not None:
+                count += 1
+                yield img
+        return
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source {source!r}")
+    try:
+        while max_frames is None or count < max_frames:
+            success, img = cap.read()
+            if not success:
+                break
+            count += 1
+            yield img
+    finally:
+        cap.release()
+
+
+def run_batch(source, matcher, attendance, tracking=False, detect_every=DETECT_EVERY, max_frames=None,
+              adaptive=False, budget=DETECT_BUDGET, motion_gate=False, batch_size=1, num_jitters=NUM_JITTERS,
+              detector=DEFAULT_DETECTOR, quality_gate=False):
+    """Process every frame of ``source`` and return a report dict."""
+    metrics = Metrics()
+    scheduler = DetectionScheduler(adaptive=adaptive, budget=budget, detector=detector)
+    recognizer = FrameRecognizer(matcher, scheduler, metrics=metrics, num_jitters=num_jitters,
+                                 gate=QualityGate() if quality_gate else None)
+    frames = iter_frames(source, max_frames)
+    if tracking or motion_gate:
+        # Tracks and the motion background need frames one at a time, in order
+        batch_size = 1
+    if batch_size > 1:
+        chunks = iter(lambda: list(itertools.islice(frames, batch_size)), [])
+        process = recognizer.process_many
+    else:
+        if tracking:
+            recognizer = TrackingRecognizer(recognizer, detect_every)
+        if motion_gate:
+            recognizer = MotionGatedRecognizer(recognizer, MotionGate(), metrics=metrics)
+        chunks = ([img] for img in frames)
+
+        def process(imgs):
+            return [recognizer.process(imgs[0])]
+    marked_cache = MarkedTodayCache()
+    marked = []
+
+    start = time.perf_counter()
+    for imgs in chunks:
+        chunk_start = time.perf_counter()
+        batch_results = process(imgs)
+        with metrics.stage('mark'):
+            for results in batch_results:
+                for result in results:
+                    if markable(result) and marked_cache.should_mark(result.name):
+                        is_new = attendance.mark(result.name.upper())
+                        marked_cache.record(result.name, is_new)
+                        if is_new:
+                            marked.append(result.name.upper())
+        # Frames of a batch share its cost equally
+        frame_seconds = (time.perf_counter() - chunk_start) / len(imgs)
+        for results in batch_results:
+            metrics.observe('frame', frame_seconds)
+            metrics.count('frames')
+            metrics.count('faces', len(results))
+    attendance.flush()
+    elapsed = time.perf_counter() - start
+
+    frames = metrics.counters.get('frames', 0)
+    faces = metrics.counters.get('faces', 0)
+    return {
+        'source': source,
+        'tracking': tracking,
+        'adaptive': adaptive,
+        'motion_gate': motion_gate,
+        'batch_size': batch_size,
+        'detector': detector,
+        'quality_gate': quality_gate,
+        'low_quality_faces': metrics.counters.get('low_quality', 0),
+        'gated_frames': metrics.counters.get('gated_frames', 0),
+        'roster_size': len(matcher),
+        'frames': frames,
+        'faces': faces,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed else 0.0,
+        'faces_per_sec': faces / elapsed if elapsed else 0.0,
+        'stages': metrics.summary(),
+        'marked': marked,
+    }
+
+
+def compare_detectors(source, detectors, max_frames=None, scale=DETECTION_SCALE, min_iou=0.4):
+    """Run several detector backends on the same frames and return a report dict.
+
+    Frames are downscaled by ``scale`` as in the camera loop. A face found
+    by the first (reference) detector counts as found by another one when
+    one of its boxes overlaps it by at least ``min_iou``.
+    """
+    built = [(name, make_detector(name)) for name in detectors]
+    metrics = Metrics()
+    faces = dict.fromkeys(detectors, 0)
+    found = dict.fromkeys(detectors, 0)
+    frames = 0
+    for img in iter_frames(source, max_frames):
+        frames += 1
+        rgb = cv2.cvtColor(cv2.resize(img, (0, 0), fx=scale, fy=scale), cv2.COLOR_BGR2RGB)
+        boxes = {}
+        for name, detector in built:
+            with metrics.stage(name):
+                boxes[name] = detector(rgb)
+            faces[name] += len(boxes[name])
+        for reference in boxes[detectors[0]]:
+            for name in detectors:
+                found[name] += any(iou(reference, box) >= min_iou for box in boxes[name])
+    stages = metrics.summary()
+    reference_faces = faces[detectors[0]]
+    return {
+        'source': source,
+        'frames': frames,
+        'scale': scale,
+        'reference': detectors[0],
+        'detectors': {name: dict(stages.get(name, {}), faces=faces[name],
+                                 recall=found[name] / reference_faces if reference_faces else None)
+                      for name in detectors},
+    }
+
+
+def format_comparison(report):
+    lines = [
+        f"{report['source']}: {report['frames']} frames at scale {report['scale']}, "
+        f"recall against {report['reference']}",
+        f"  {'detector':<16}{'mean':>10}{'p50':>10}{'p90':>10}{'faces':>8}{'recall':>8}  (ms)",
+    ]
+    for name, stats in report['detectors'].items():
+        recall = f"{stats['recall']:.3f}" if stats['recall'] is not None else '-'
+        lines.append(f"  {name:<16}{stats.get('mean_ms', 0):>10.2f}{stats.get('p50_ms', 0):>10.2f}"
+                     f"{stats.get('p90_ms', 0):>10.2f}{stats['faces']:>8}{recall:>8}")
+    return '\n'.join(lines)
+
+
+def format_report(report):
+    lines = [
+        f"{report['source']}: {report['frames']} frames, {report['faces']} faces in {report['seconds']:.2f}s",
+        f"  {report['fps']:.1f} frames/s, {report['faces_per_sec']:.1f} faces/s, roster {report['roster_size']}",
+        f"  {'stage':<12}{'count':>8}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}  (ms)",
+    ]
+    for name, stats in report['stages'].items():
+        lines.append(f"  {name:<12}{stats['count']:>8}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+                     f"{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    if report['quality_gate']:
+        lines.append(f"  skipped for quality: {report['low_quality_faces']} of {report['faces']} faces")
+    if report['marked']:
+        lines.append(f"  marked: {', '.join(report['marked'])}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run recognition over a video file or frame directory.")
+    parser.add_argument('source', help="video file or directory of frames")
+    parser.add_argument('--images', default=IMAGE_DIR, help="directory of registration photos")
+    parser.add_argument('--store', default=None,
+                        help="encoding store directory (default: Encoding_Store for Register_Data, "
+                             "else a private store inside --images)")
+    parser.add_argument('--db', default=None, help="attendance database to write (default: in-memory)")
+    parser.add_argument('--tracking', action='store_true', help="use detect-once, track-between-detections mode")
+    parser.add_argument('--detect-every', type=int, default=DETECT_EVERY)
+    parser.add_argument('--adaptive', action='store_true', help="use adaptive detection scale and regions of interest")
+    parser.add_argument('--budget', type=float, default=DETECT_BUDGET, help="detection time budget per frame (s)")
+    parser.add_argument('--motion-gate', action='store_true', help="skip detection on static frames")
+    parser.add_argument('--batch-size', type=int, default=1, help="frames whose faces are encoded together")
+    parser.add_argument('--jitters', type=int, default=NUM_JITTERS, help="resamples per face when encoding")
+    parser.add_argument('--detector', choices=DETECTORS, default=DEFAULT_DETECTOR, help="face detector backend")
+    parser.add_argument('--quality-gate', action='store_true',
+                        help="skip faces too small, blurred or turned away before encoding")
+    parser.add_argument('--compare-detectors', nargs='+', choices=DETECTORS, metavar='DETECTOR',
+                        help="only time these detectors on the frames; recall is against the first")
+    parser.add_argument('--max-frames', type=int, default=None)
+    parser.add_argument('--json', metavar='PATH', help="write the report as JSON ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    if args.compare_detectors:
+        report = compare_detectors(args.source, args.compare_detectors, args.max_frames)
+        _write_report(report, format_comparison, args.json)
+        return 0
+
+    store_dir = args.store or default_store_dir(args.images)
+    with store_lock(store_dir):
+        store = EncodingStore(store_dir)
+        store.sync(args.images)
+        matcher = FaceMatcher.from_store(store)
+    if args.db:
+        attendance = AttendanceLog(args.db)
+    else:
+        attendance = AttendanceLog(':memory:', csv_path=None)
+    try:
+        report = run_batch(args.source, matcher, attendance, args.tracking, args.detect_every, args.max_frames,
+                           args.adaptive, args.budget, args.motion_gate, args.batch_size, args.jitters,
+                           args.detector, args.quality_gate)
+    finally:
+        attendance.close()
+    _write_report(report, format_report, args.json)
+    return 0
+
+
+def _write_report(report, format_func, json_path):
+    if json_path == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_func(report))
+        if json_path:
+            with open(json_path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Face detector backends.
+
+Every detector is called with an RGB image and returns face boxes
+(top, right, bottom, left) in its pixel coordinates, like
+``face_recognition.face_locations``:
+
+- ``hog``: dlib's HOG detector (the original path; accurate, the slowest)
+- ``haar``: OpenCV's frontal-face Haar cascade, shipped with opencv-python
+- ``ssd``: OpenCV's DNN ResNet-10 SSD face detector; the two model files
+  (``deploy.prototxt`` and ``res10_300x300_ssd_iter_140000.caffemodel``)
+  are not bundled and must be placed in ``SSD_MODEL_DIR`` (``models/``) by hand
+- ``haar+hog``, ``ssd+hog``: two-stage cascade. The cheap detector proposes
+  candidate boxes with a low threshold and HOG only runs on a small crop
+  around each candidate, so a frame costs one cheap pass plus a few tiny
+  HOG passes instead of HOG over the whole frame.
+- ``haar+landmarks``, ``ssd+landmarks``: candidates are confirmed by fitting
+  the 5-point landmark model and checking that the eyes and nose sit where
+  a face's would, which is cheaper still than HOG.
+
+OpenCV models are not safe to share between threads, so each worker thread
+loads its own.
+"""
+import os
+import threading
+
+import cv2
+import face_recognition
+import numpy as np
+
+DETECTORS = ('hog', 'haar', 'ssd', 'haar+hog', 'haar+landmarks', 'ssd+hog', 'ssd+landmarks')
+DEFAULT_DETECTOR = 'hog'
+
+HAAR_CASCADE = 'haarcascade_frontalface_default.xml'
+HAAR_SCALE_FACTOR = 1.1
+HAAR_MIN_NEIGHBORS = 4
+HAAR_MIN_SIZE = 20
+SSD_MODEL_DIR = 'models'
+SSD_CONFIG = 'deploy.prototxt'
+SSD_WEIGHTS = 'res10_300x300_ssd_iter_140000.caffemodel'
+SSD_INPUT_SIZE = 300
+SSD_CONFIDENCE = 0.5
+# Proposals are kept generously when a second stage confirms them
+PROPOSAL_MIN_NEIGHBORS = 2
+PROPOSAL_CONFIDENCE = 0.3
+# Crop around a proposal, as a fraction of its size, and the face size HOG sees in it
+CONFIRM_MARGIN = 0.4
+CONFIRM_FACE = 100
+
+
+def _clip(box, height, width):
+    top, right, bottom, left = box
+    return max(top, 0), min(right, width), min(bottom, height), max(left, 0)
+
+
+def _overlaps(a, b):
+    # Neighbouring proposals can confirm the same face twice
+    return a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]
+
+
+class HogDetector:
+    name = 'hog'
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+
+    def __call__(self, rgb):
+        return face_recognition.face_locations(rgb, number_of_times_to_upsample=self.upsample)
+
+
+class HaarDetector:
+    name = 'haar'
+
+    def __init__(self, min_neighbors=HAAR_MIN_NEIGHBORS):
+        self.path = os.path.join(cv2.data.haarcascades, HAAR_CASCADE)
+        if not os.path.exists(self.path):
+            raise IOError(f"Haar cascade not found at {self.path}")
+        self.min_neighbors = min_neighbors
+        self._local = threading.local()
+
+    def __call__(self, rgb):
+        local = self._local
+        if not hasattr(local, 'cascade'):
+            local.cascade = cv2.CascadeClassifier(self.path)
+        local.gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY, dst=getattr(local, 'gray', None))
+        faces = local.cascade.detectMultiScale(local.gray, scaleFactor=HAAR_SCALE_FACTOR,
+                                               minNeighbors=self.min_neighbors,
+                                               minSize=(HAAR_MIN_SIZE, HAAR_MIN_SIZE))
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in faces]
+
+
+class SsdDetector:
+    name = 'ssd'
+
+    def __init__(self, confidence=SSD_CONFIDENCE, model_dir=SSD_MODEL_DIR):
+        self.config = os.path.join(model_dir, SSD_CONFIG)
+        self.weights = os.path.join(model_dir, SSD_WEIGHTS)
+        for path in (self.config, self.weights):
+            if not os.path.exists(path):
+                raise IOError(f"SSD face detector model not found: {path}")
+        self.confidence = confidence
+        self._local = threading.local()
+
+    def __call__(self, rgb):
+        local = self._local
+        if not hasattr(local, 'net'):
+            local.net = cv2.dnn.readNetFromCaffe(self.config, self.weights)
+        height, width = rgb.shape[:2]
+        # The network was trained on BGR with these channel means
+        blob = cv2.dnn.blobFromImage(rgb, 1.0, (SSD_INPUT_SIZE, SSD_INPUT_SIZE), (104.0, 177.0, 123.0),
+                                     swapRB=True)
+        local.net.setInput(blob)
+        detections = local.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+        boxes = []
+        for x1, y1, x2, y2 in detections[:, 3:7] * np.array([width, height, width, height]):
+            box = _clip((int(y1), int(x2), int(y2), int(x1)), height, width)
+            if box[2] > box[0] and box[1] > box[3]:
+                boxes.append(box)
+        return boxes
+
+
+def plausible_landmarks(points, box):
+    """True if 5-point landmarks (two corners per eye, then the nose) look like a face in ``box``."""
+    top, right, bottom, left = box
+    width, height = right - left, bottom - top
+    eye_a = (points[0] + points[1]) / 2
+    eye_b = (points[2] + points[3]) / 2
+    nose = points[4]
+    eye_distance = abs(eye_a[0] - eye_b[0])
+    eyes_y = (eye_a[1] + eye_b[1]) / 2
+    return (0.2 * width <= eye_distance <= 0.8 * width
+            and abs(eye_a[1] - eye_b[1]) <= 0.25 * height
+            and nose[1] > eyes_y + 0.05 * height
+            and min(eye_a[0], eye_b[0]) < nose[0] < max(eye_a[0], eye_b[0])
+            and top <= eyes_y <= top + 0.7 * height)
+
+
+class CascadeDetector:
+    """Cheap proposals confirmed by HOG on a crop around each, or by landmarks."""
+
+    def __init__(self, proposer, confirm='hog'):
+        if confirm not in ('hog', 'landmarks'):
+            raise ValueError(f"Unknown confirmation {confirm!r}; use 'hog' or 'landmarks'")
+        self.proposer = proposer
+        self.confirm = confirm
+        self.name = f"{proposer.name}+{confirm}"
+
+    def __call__(self, rgb):
+        proposals = self.proposer(rgb)
+        if not proposals:
+            return []
+        if self.confirm == 'landmarks':
+            shapes = face_recognition.api._raw_face_landmarks(rgb, proposals, model='small')
+            return [box for box, shape in zip(proposals, shapes)
+                    if plausible_landmarks(np.array([(p.x, p.y) for p in shape.parts()], dtype=np.float32), box)]
+        height, width = rgb.shape[:2]
+        faces = []
+        for box in proposals:
+            top, right, bottom, left = box
+            size = max(bottom - top, right - left)
+            margin = int(size * CONFIRM_MARGIN)
+            top, right, bottom, left = _clip((top - margin, right + margin, bottom + margin, left - margin),
+                                             height, width)
+            # HOG without upsampling on a crop where the face is about CONFIRM_FACE pixels
+            scale = CONFIRM_FACE / max(size, 1)
+            if bottom <= top or right <= left:
+                continue
+            crop = cv2.resize(rgb[top:bottom, left:right], (0, 0), fx=scale, fy=scale)
+            for t, r, b, l in face_recognition.face_locations(crop, number_of_times_to_upsample=0):
+                face = (int(t / scale) + top, int(r / scale) + left, int(b / scale) + top, int(l / scale) + left)
+                if not any(_overlaps(face, other) for other in faces):
+                    faces.append(face)
+        return faces
+
+
+def make_detector(name=DEFAULT_DETECTOR):
+    """Build a detector from its name, one of ``DETECTORS``."""
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector {name!r}; choose from {', '.join(DETECTORS)}")
+    if name == 'hog':
+        return HogDetector()
+    proposer_name, _, confirm = name.partition('+')
+    if not confirm:
+        return HaarDetector() if proposer_name == 'haar' else SsdDetector()
+    proposer = (HaarDetector(PROPOSAL_MIN_NEIGHBORS) if proposer_name == 'haar'
+                else SsdDetector(PROPOSAL_CONFIDENCE))
+    return CascadeDetector(proposer, confirm)
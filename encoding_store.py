@@ -0,0 +1,278 @@
+"""Persistent store of precomputed face encodings for the images in Register_Data.
+
+A person is either a single photo ``Register_Data/<name>.jpg`` or a folder of
+photos ``Register_Data/<name>/*.jpg``; every photo gets its own row, keyed by
+its path relative to Register_Data.
+
+The store keeps every known encoding in a single float32 matrix
+(``encodings.npy``) plus a small JSON manifest with one entry per row. Each
+entry records the source file, the person's name, the file's SHA-1 digest and
+its mtime/size, so a sync only re-encodes photos that are new or changed. The
+manifest also records the SHA-1 of the matrix it was saved with, so a matrix
+and manifest from different saves are never paired up.
+"""
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+
+from locking import FileLock
+
+IMAGE_DIR = 'Register_Data'
+STORE_DIR = 'Encoding_Store'
+MATRIX_FILE = 'encodings.npy'
+MANIFEST_FILE = 'manifest.json'
+# Small previews of registered photos, named by content digest
+THUMBNAIL_DIR = 'thumbnails'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+ENCODING_SIZE = 128
+
+
+def file_digest(file_path):
+    """Return the SHA-1 hex digest of a file's content."""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def matrix_digest(encodings):
+    """Return the SHA-1 hex digest of an encoding matrix's contents."""
+    return hashlib.sha1(np.ascontiguousarray(encodings).tobytes()).hexdigest()
+
+
+def encode_largest_face(file_path):
+    """Return (faces found, encoding of the largest face) for an image file.
+
+    The encoding is None when the file can't be read or shows no face. Every
+    path that encodes registered photos goes through here, so a photo gets
+    the same embedding whichever of them processed it.
+    """
+    # Imported here so listing photos and loading the store stay lightweight
+    import cv2
+    import face_recognition
+    img = cv2.imread(file_path)
+    if img is None:
+        return 0, None
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(img)
+    if not locations:
+        return 0, None
+    largest = max(locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+    return len(locations), face_recognition.face_encodings(img, [largest])[0]
+
+
+def encode_image(file_path):
+    """Encode the largest face found in an image file, or return None."""
+    return encode_largest_face(file_path)[1]
+
+
+def identity_name(file):
+    """Person's name for an image: its folder, or the file name for a flat photo."""
+    folder, _, base = file.rpartition('/')
+    return folder or os.path.splitext(base)[0]
+
+
+def image_meta(image_dir, file, stat=None):
+    """Build the manifest entry for an image, hashing its content."""
+    file_path = os.path.join(image_dir, file)
+    stat = stat or os.stat(file_path)
+    return {'file': file, 'name': identity_name(file),
+            'sha1': file_digest(file_path),
+            'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+def _is_image(file):
+    return os.path.splitext(file)[1].lower() in IMAGE_EXTENSIONS
+
+
+def list_images(image_dir):
+    """Return every photo as a '/'-separated path relative to ``image_dir``."""
+    if not os.path.isdir(image_dir):
+        return []
+    files = []
+    for entry in sorted(os.listdir(image_dir)):
+        folder = os.path.join(image_dir, entry)
+        if os.path.isdir(folder):
+            if not entry.startswith('.'):
+                files += [f"{entry}/{f}" for f in sorted(os.listdir(folder)) if _is_image(f)]
+        elif _is_image(entry):
+            files.append(entry)
+    return files
+
+
+def list_identities(image_dir):
+    return sorted({identity_name(file) for file in list_images(image_dir)})
+
+
+def new_photo_file(image_dir, name, extension):
+    """Return an unused path for another photo of ``name``, creating its folder."""
+    os.makedirs(os.path.join(image_dir, name), exist_ok=True)
+    for n in itertools.count(1):
+        file = f"{name}/{n}{extension.lower()}"
+        if not os.path.exists(os.path.join(image_dir, file)):
+            return file
+
+
+def default_store_dir(image_dir=IMAGE_DIR):
+    """Store for the photos in ``image_dir``: the shared store for Register_Data, else a private one.
+
+    Syncing the shared store against another directory would drop every
+    registered user from the roster the cameras use. The private store sits
+    in a hidden folder of ``image_dir``, which ``list_images`` skips.
+    """
+    if os.path.abspath(image_dir) == os.path.abspath(IMAGE_DIR):
+        return STORE_DIR
+    return os.path.join(image_dir, '.' + STORE_DIR.lower())
+
+
+def thumbnail_path(store_dir, digest):
+    """Thumbnail file of the photo with content digest ``digest``."""
+    return os.path.join(store_dir, THUMBNAIL_DIR, f"{digest}.jpg")
+
+
+def store_lock(store_dir=STORE_DIR):
+    """Lock held by any process while it loads, changes and saves the store."""
+    os.makedirs(store_dir, exist_ok=True)
+    return FileLock(os.path.join(store_dir, 'store'))
+
+
+class EncodingStore:
+    """On-disk encoding matrix keyed by image content hash and mtime."""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self.entries = []
+        self.failed = {}
+        self.encodings = np.zeros((0, ENCODING_SIZE), dtype=np.float32)
+        self.load()
+
+    @property
+    def names(self):
+        return [entry['name'] for entry in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self):
+        manifest_path = os.path.join(self.store_dir, MANIFEST_FILE)
+        matrix_path = os.path.join(self.store_dir, MATRIX_FILE)
+        if not (os.path.exists(manifest_path) and os.path.exists(matrix_path)):
+            return
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        encodings = np.load(matrix_path)
+        # A half-written store is treated as empty and rebuilt by the next sync
+        if len(encodings) != len(manifest['entries']):
+            return
+        if manifest.get('matrix_sha1', matrix_digest(encodings)) != matrix_digest(encodings):
+            return
+        self.entries = manifest['entries']
+        self.failed = manifest.get('failed', {})
+        self.encodings = encodings
+
+    def save(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        matrix_path = os.path.join(self.store_dir, MATRIX_FILE)
+        manifest_path = os.path.join(self.store_dir, MANIFEST_FILE)
+        # Write to temporary files first so readers never see a partial file; a crash
+        # between the two replaces leaves a matrix whose digest the manifest doesn't name
+        with open(matrix_path + '.tmp', 'wb') as f:
+            np.save(f, self.encodings)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump({'entries': self.entries, 'failed': self.failed,
+                       'matrix_sha1': matrix_digest(self.encodings)}, f)
+        os.replace(matrix_path + '.tmp', matrix_path)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    def stale_files(self, image_dir):
+        """Return (file, meta) pairs for images that need (re)encoding.
+
+        Entries whose image has been deleted are dropped, and rows whose
+        content is unchanged (only the mtime moved, or the file was renamed)
+        are refreshed in place without re-encoding.
+        """
+        files = list_images(image_dir)
+        present = set(files)
+        by_file = {entry['file']: i for i, entry in enumerate(self.entries)}
+        by_digest = {entry['sha1']: i for i, entry in enumerate(self.entries)}
+        updates = {}
+        stale = []
+        for file in files:
+            stat = os.stat(os.path.join(image_dir, file))
+            row = by_file.get(file)
+            known = self.entries[row] if row is not None else self.failed.get(file)
+            if known and known['mtime'] == stat.st_mtime and known['size'] == stat.st_size:
+                continue
+            meta = image_meta(image_dir, file, stat)
+            if known and known['sha1'] == meta['sha1']:
+                known['mtime'], known['size'] = meta['mtime'], meta['size']
+                continue
+            if meta['sha1'] in by_digest:
+                updates[file] = (meta, self.encodings[by_digest[meta['sha1']]])
+                self.failed.pop(file, None)
+                continue
+            stale.append((file, meta))
+        removed = [entry['file'] for entry in self.entries if entry['file'] not in present]
+        self.failed = {f: meta for f, meta in self.failed.items() if f in present}
+        self._apply(updates, removed)
+        return stale
+
+    def put(self, meta, encoding):
+        """Insert or replace the row for ``meta['file']``.
+
+        A None encoding records the image as failed so it is skipped until
+        the file changes.
+        """
+        self.put_many([(meta, encoding)])
+
+    def put_many(self, items):
+        """Insert or replace a batch of (meta, encoding) rows in one rebuild."""
+        items = list(items)
+        updates = {}
+        for meta, encoding in items:
+            if encoding is None:
+                self.failed[meta['file']] = meta
+                updates.pop(meta['file'], None)
+            else:
+                self.failed.pop(meta['file'], None)
+                updates[meta['file']] = (meta, encoding)
+        # Drop old rows for images that were re-encoded but no longer show a face
+        rows = {entry['file'] for entry in self.entries}
+        self._apply(updates, [meta['file'] for meta, encoding in items
+                              if encoding is None and meta['file'] in rows])
+
+    def sync(self, image_dir, encode=encode_image, map_func=map):
+        """Bring the store up to date with ``image_dir`` and save it.
+
+        Returns the files in which no face could be found.
+        """
+        stale = self.stale_files(image_dir)
+        paths = [os.path.join(image_dir, file) for file, _ in stale]
+        self.put_many(zip([meta for _, meta in stale], map_func(encode, paths)))
+        self.save()
+        return sorted(self.failed)
+
+    def _apply(self, updates, removed):
+        # Rebuild the matrix once per batch rather than once per row
+        if not updates and not removed:
+            return
+        drop = set(removed) | set(updates)
+        keep = [i for i, entry in enumerate(self.entries) if entry['file'] not in drop]
+        entries = [self.entries[i] for i in keep]
+        rows = [self.encodings[keep]]
+        for file, (meta, encoding) in updates.items():
+            entries.append(meta)
+            rows.append(np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_SIZE))
+        # Thumbnails of photos no row refers to any more are deleted with their rows
+        gone = {entry['sha1'] for entry in self.entries} - {entry['sha1'] for entry in entries}
+        self.entries = entries
+        self.encodings = np.ascontiguousarray(np.concatenate(rows), dtype=np.float32)
+        for digest in gone:
+            try:
+                os.remove(thumbnail_path(self.store_dir, digest))
+            except FileNotFoundError:
+                pass
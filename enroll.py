@@ -0,0 +1,95 @@
+"""Headless bulk enrollment of Register_Data into the encoding store.
+
+Photos can sit directly in Register_Data (``<name>.jpg``) or in one folder
+per person (``<name>/*.jpg``) for several photos of the same identity.
+Decoding, detection and encoding of new or changed photos are fanned out
+over a multiprocessing pool, and results are written straight into the
+encoding store in batches. Photos with no face are recorded as failed;
+photos with several faces are enrolled using the largest face and reported.
+
+Usage::
+
+    python -m enroll [--images Register_Data] [--store Encoding_Store] [--workers N]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from collections import namedtuple
+
+from encoding_store import IMAGE_DIR, STORE_DIR, EncodingStore, encode_largest_face, store_lock
+from shared_roster import publish_roster
+
+# Write to disk every this many photos so an interrupted run keeps its progress
+SAVE_EVERY = 500
+
+EnrollResult = namedtuple('EnrollResult', ['file', 'faces', 'encoding'])
+EnrollReport = namedtuple('EnrollReport', ['enrolled', 'no_face', 'multiple_faces'])
+
+
+def encode_file(args):
+    """Decode, detect and encode one photo (runs in a pool worker)."""
+    image_dir, file = args
+    faces, encoding = encode_largest_face(os.path.join(image_dir, file))
+    return EnrollResult(file, faces, encoding)
+
+
+def bulk_enroll(image_dir=IMAGE_DIR, store_dir=STORE_DIR, workers=None, progress=None):
+    """Encode every new or changed photo in ``image_dir`` into the store.
+
+    ``progress`` is called as ``progress(done, total, result)`` after each
+    photo. Returns an EnrollReport listing enrolled files and files with
+    zero or multiple faces.
+    """
+    # Watchers of running cameras wait for the whole run instead of syncing half of it
+    with store_lock(store_dir):
+        store = EncodingStore(store_dir)
+        stale = store.stale_files(image_dir)
+        metas = dict(stale)
+        report = EnrollReport([], [], [])
+        batch = []
+        jobs = [(image_dir, file) for file, _ in stale]
+        with multiprocessing.Pool(workers) as pool:
+            for done, result in enumerate(pool.imap_unordered(encode_file, jobs, chunksize=4), 1):
+                batch.append((metas[result.file], result.encoding))
+                if result.faces == 0:
+                    report.no_face.append(result.file)
+                else:
+                    report.enrolled.append(result.file)
+                    if result.faces > 1:
+                        report.multiple_faces.append(result.file)
+                if progress:
+                    progress(done, len(jobs), result)
+                if len(batch) >= SAVE_EVERY:
+                    store.put_many(batch)
+                    store.save()
+                    batch = []
+        store.put_many(batch)
+        store.save()
+        # Running recognition processes remap the new roster without a restart
+        publish_roster(store)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-enroll registered photos into the encoding store.")
+    parser.add_argument('--images', default=IMAGE_DIR, help="directory of registration photos")
+    parser.add_argument('--store', default=STORE_DIR, help="encoding store directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    def progress(done, total, result):
+        status = 'no face' if result.faces == 0 else 'ok' if result.faces == 1 else f'{result.faces} faces'
+        print(f"[{done}/{total}] {result.file}: {status}", flush=True)
+
+    report = bulk_enroll(args.images, args.store, args.workers, progress)
+    print(f"Enrolled {len(report.enrolled)} photo(s).")
+    for file in report.no_face:
+        print(f"No face found: {file}", file=sys.stderr)
+    for file in report.multiple_faces:
+        print(f"Multiple faces (largest used): {file}", file=sys.stderr)
+    return 1 if report.no_face else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Inter-process file locks (fcntl on POSIX, msvcrt on Windows).
+
+The lock is held on a separate ``<path>.lock`` file, so the protected file
+itself can be replaced atomically while the lock is held.
+"""
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive advisory lock shared by every process using the same path."""
+
+    def __init__(self, path):
+        self.path = path + '.lock'
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """Take the lock; with ``blocking=False`` return False if another process holds it."""
+        f = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                # LK_LOCK retries for about 10 seconds before raising
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            if blocking:
+                raise
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        f, self._file = self._file, None
+        if f is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        f.close()
+
+    def remove(self):
+        """Delete the lock file; only safe once no process can still want it."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
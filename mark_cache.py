@@ -0,0 +1,58 @@
+"""Per-session cache of identities already marked today.
+
+Once someone is marked, the camera loop keeps recognizing them for as long
+as they stay in view. The cache lets the loop skip the attendance store for
+them entirely until midnight, and a per-identity cooldown rate-limits mark
+attempts and keeps the "ATTENDANCE MARKED" banner up without pausing the
+video.
+"""
+import threading
+from datetime import datetime
+
+COOLDOWN = 3.0
+
+
+class MarkedTodayCache:
+    """Identities marked on the current date, cleared at day rollover."""
+
+    def __init__(self, cooldown=COOLDOWN):
+        self.cooldown = cooldown
+        self.day = None
+        self._marked = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def _rollover(self, now):
+        if now.date() != self.day:
+            self.day = now.date()
+            self._marked.clear()
+            self._attempts.clear()
+
+    def should_mark(self, name, now=None):
+        """True if ``name`` still needs a trip to the attendance store."""
+        now = now or datetime.now()
+        with self._lock:
+            self._rollover(now)
+            if name in self._marked:
+                return False
+            last = self._attempts.get(name)
+            return last is None or (now - last).total_seconds() >= self.cooldown
+
+    def record(self, name, is_new, now=None):
+        """Remember a mark attempt; the store has ``name`` for today either way."""
+        now = now or datetime.now()
+        with self._lock:
+            self._rollover(now)
+            self._attempts[name] = now
+            # Only fresh marks get the banner; existing ones are just cached
+            self._marked[name] = now if is_new else None
+
+    def recently_marked(self, name, now=None):
+        """True while the "ATTENDANCE MARKED" banner should show for ``name``."""
+        now = now or datetime.now()
+        with self._lock:
+            marked_at = self._marked.get(name)
+            return marked_at is not None and (now - marked_at).total_seconds() < self.cooldown
+
+    def __len__(self):
+        return len(self._marked)
@@ -0,0 +1,122 @@
+"""Vectorized nearest-neighbour matching of face encodings against the roster."""
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from ann_index import DEFAULT_NPROBE, BruteForceIndex, index_for_roster
+from shared_roster import publish_roster
+from templates import MAX_TEMPLATES
+
+# Same default as face_recognition.compare_faces
+DEFAULT_TOLERANCE = 0.6
+# Seconds between checks for a newer published roster
+REFRESH_INTERVAL = 1.0
+
+MatchResult = namedtuple('MatchResult', ['indices', 'distances', 'matched', 'names'])
+
+
+class FaceMatcher:
+    """Resolves all faces in a frame against the roster in one batched lookup.
+
+    The lookup is delegated to an index from ``ann_index``; by default a
+    ``BruteForceIndex`` holding the known encodings as one contiguous float32
+    matrix with precomputed norms. Rows are templates, several of which may
+    share a name, so the nearest row is also the best-scoring identity.
+
+    A matcher built from a SharedRoster maps the published matrix instead
+    of copying it. When a newer version is published, ``match`` keeps
+    answering from the current roster while a background thread maps the
+    new one; names and index are then swapped together between two calls,
+    so recognition never waits for a reload and one ``match`` never mixes
+    two rosters.
+    """
+
+    def __init__(self, encodings, names, tolerance=DEFAULT_TOLERANCE, index=None):
+        names = list(names)
+        self.tolerance = tolerance
+        if index is None:
+            index = BruteForceIndex(np.asarray(encodings, dtype=np.float32).reshape(len(names), -1))
+        self._roster = (names, index)
+        self._lock = threading.Lock()
+        self.shared = None
+        self.version = None
+        self._kind = 'auto'
+        self._nprobe = DEFAULT_NPROBE
+        self._checked = time.monotonic()
+        self._reloading = False
+
+    @classmethod
+    def from_shared(cls, shared, tolerance=DEFAULT_TOLERANCE, kind='auto', nprobe=DEFAULT_NPROBE):
+        """Build a matcher over the roster published in a SharedRoster, following its updates."""
+        version, roster = shared.load()
+        matcher = cls(roster.encodings, roster.names, tolerance,
+                      index=index_for_roster(roster, shared.store_dir, kind, nprobe))
+        matcher.shared, matcher.version = shared, version
+        matcher._kind, matcher._nprobe = kind, nprobe
+        return matcher
+
+    @classmethod
+    def from_store(cls, store, tolerance=DEFAULT_TOLERANCE, kind='auto', nprobe=DEFAULT_NPROBE,
+                   max_templates=MAX_TEMPLATES):
+        """Publish the per-identity templates of an encoding store and match against them."""
+        return cls.from_shared(publish_roster(store, max_templates), tolerance, kind, nprobe)
+
+    @property
+    def names(self):
+        return self._roster[0]
+
+    @property
+    def index(self):
+        return self._roster[1]
+
+    def __len__(self):
+        return len(self.names)
+
+    def refresh(self, force=False):
+        """Remap the shared roster if a newer version was published; True if it changed."""
+        now = time.monotonic()
+        if self.shared is None or (not force and now - self._checked < REFRESH_INTERVAL):
+            return False
+        self._checked = now
+        if self.shared.version() == self.version:
+            return False
+        with self._lock:
+            version, roster = self.shared.load()
+            if version == self.version:
+                return False
+            index = index_for_roster(roster, self.shared.store_dir, self._kind, self._nprobe)
+            self._roster = (list(roster.names), index)
+            self.version = version
+        return True
+
+    def _refresh_in_background(self):
+        now = time.monotonic()
+        if self.shared is None or self._reloading or now - self._checked < REFRESH_INTERVAL:
+            return
+        self._checked = now
+        if self.shared.version() == self.version:
+            return
+        self._reloading = True
+
+        def reload():
+            try:
+                self.refresh(force=True)
+            finally:
+                self._reloading = False
+        threading.Thread(target=reload, daemon=True).start()
+
+    def match(self, face_encodings):
+        """Return the best index, distance, thresholded match and matched name per face."""
+        self._refresh_in_background()
+        names, index = self._roster
+        queries = np.asarray(face_encodings, dtype=np.float32)
+        if len(queries) == 0 or len(names) == 0:
+            count = len(queries)
+            return MatchResult(np.full(count, -1), np.full(count, np.inf), np.zeros(count, dtype=bool),
+                               [None] * count)
+        indices, distances = index.search(queries.reshape(len(queries), -1))
+        matched = distances <= self.tolerance
+        return MatchResult(indices, distances, matched,
+                           [names[i] if hit else None for i, hit in zip(indices, matched)])
@@ -0,0 +1,172 @@
+"""Per-stage timing of the recognition path.
+
+``Metrics`` records stage latencies into rolling windows (for percentiles)
+and fixed-bucket histograms (for Prometheus), plus counters, gauges and
+event rates such as FPS. ``NULL_METRICS`` has the same interface but records
+nothing, so instrumented code costs next to nothing when metrics are off.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+# Rolling window of samples kept per stage by the live app
+LIVE_WINDOW = 300
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+PROMETHEUS_PREFIX = 'attendance'
+
+
+class StageStats:
+    __slots__ = ('window', 'buckets', 'count', 'sum')
+
+    def __init__(self, window):
+        self.window = deque(maxlen=window)
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, seconds):
+        self.window.append(seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class Metrics:
+    """Collects per-stage latencies, counters, gauges and event rates.
+
+    ``window`` bounds the samples kept per stage for percentiles; None keeps
+    every sample (batch runs).
+    """
+
+    def __init__(self, window=None):
+        self.window = window
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self._ticks = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats(self.window)
+            stats.add(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def tick(self, name):
+        """Record one event of ``name`` for rate (events/sec) reporting."""
+        with self._lock:
+            ticks = self._ticks.get(name)
+            if ticks is None:
+                ticks = self._ticks[name] = deque(maxlen=LIVE_WINDOW)
+            ticks.append(time.perf_counter())
+
+    def rates(self):
+        rates = {}
+        with self._lock:
+            for name, ticks in self._ticks.items():
+                span = ticks[-1] - ticks[0] if len(ticks) > 1 else 0
+                rates[name] = (len(ticks) - 1) / span if span > 0 else 0.0
+        return rates
+
+    def summary(self):
+        """Return {stage: {count, mean_ms, p50_ms, p90_ms, p99_ms}} over the window."""
+        with self._lock:
+            windows = {name: list(stats.window) for name, stats in self.stages.items()}
+        stages = {}
+        for name, samples in windows.items():
+            ms = np.asarray(samples) * 1000
+            stats = {'count': len(ms), 'mean_ms': float(ms.mean())}
+            for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+                stats[f'p{p}_ms'] = float(value)
+            stages[name] = stats
+        return stages
+
+    def snapshot(self):
+        return {
+            'time': time.time(),
+            'stages': self.summary(),
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'rates': self.rates(),
+        }
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [f'# TYPE {prefix}_stage_seconds histogram']
+        with self._lock:
+            for name, stats in self.stages.items():
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ('+Inf',), stats.buckets):
+                    cumulative += n
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stats.sum}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stats.count}')
+            for name, value in self.counters.items():
+                lines.append(f'# TYPE {prefix}_{name}_total counter')
+                lines.append(f'{prefix}_{name}_total {value}')
+        for name, value in self.gauges.items():
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {value}')
+        for name, value in self.rates().items():
+            lines.append(f'# TYPE {prefix}_{name}_per_second gauge')
+            lines.append(f'{prefix}_{name}_per_second {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """Write a JSON snapshot (``.json``) or Prometheus text file (anything else)."""
+        content = json.dumps(self.snapshot(), indent=2) if path.endswith('.json') else self.to_prometheus()
+        with open(path + '.tmp', 'w') as f:
+            f.write(content)
+        # Scrapers never see a half-written file
+        os.replace(path + '.tmp', path)
+
+
+class NullMetrics:
+    """Drop-in for Metrics that records nothing."""
+
+    _null = nullcontext()
+
+    def stage(self, name):
+        return self._null
+
+    def observe(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def gauge(self, name, value):
+        pass
+
+    def tick(self, name):
+        pass
+
+    def summary(self):
+        return {}
+
+
+NULL_METRICS = NullMetrics()
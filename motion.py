@@ -0,0 +1,95 @@
+"""Motion-gated recognition.
+
+A cheap frame-differencing gate sits in front of face detection: each frame
+is shrunk to a small grayscale thumbnail and compared against a running
+background average. Detection only runs when enough of the thumbnail has
+changed, for ``hold`` seconds after the last motion, and at least every
+``max_idle`` seconds regardless, which bounds how long a face that appeared
+without visible motion can go unnoticed. Since every frame is checked, a
+face walking into view wakes detection up on the very next frame.
+"""
+import threading
+import time
+
+import cv2
+
+from metrics import NULL_METRICS
+
+# Fraction of thumbnail pixels that must change to count as motion
+SENSITIVITY = 0.01
+# Per-pixel gray-level difference that counts as a change
+PIXEL_THRESHOLD = 25
+# Keep detecting this long after motion stops (someone standing still)
+HOLD = 2.0
+# Run detection at least this often even when the scene is static
+MAX_IDLE = 5.0
+THUMBNAIL_SIZE = (160, 120)
+# How quickly the background absorbs lasting changes (lighting, moved chairs)
+LEARNING_RATE = 0.05
+
+
+class MotionGate:
+    """Decides per frame whether the scene changed enough to run detection."""
+
+    def __init__(self, sensitivity=SENSITIVITY, pixel_threshold=PIXEL_THRESHOLD,
+                 hold=HOLD, max_idle=MAX_IDLE, learning_rate=LEARNING_RATE):
+        self.sensitivity = sensitivity
+        self.pixel_threshold = pixel_threshold
+        self.hold = hold
+        self.max_idle = max_idle
+        self.learning_rate = learning_rate
+        self.background = None
+        self.changed = 0.0
+        self.idle = False
+        self._last_motion = 0.0
+        self._last_open = 0.0
+        self._lock = threading.Lock()
+        # Thumbnail-sized work buffers reused for every frame
+        self._small = None
+        self._gray = None
+        self._blurred = None
+        self._reference = None
+        self._diff = None
+
+    def check(self, img):
+        """Return True if detection should run on this frame."""
+        now = time.monotonic()
+        with self._lock:
+            self._small = cv2.resize(img, THUMBNAIL_SIZE, dst=self._small, interpolation=cv2.INTER_AREA)
+            self._gray = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            gray = self._blurred = cv2.GaussianBlur(self._gray, (5, 5), 0, dst=self._blurred)
+            if self.background is None:
+                self.background = gray.astype('float32')
+                self._last_motion = self._last_open = now
+                return True
+            self._reference = cv2.convertScaleAbs(self.background, dst=self._reference)
+            diff = self._diff = cv2.absdiff(gray, self._reference, dst=self._diff)
+            cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=diff)
+            self.changed = cv2.countNonZero(diff) / diff.size
+            cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+            if self.changed >= self.sensitivity:
+                self._last_motion = now
+            is_open = now - self._last_motion < self.hold or now - self._last_open >= self.max_idle
+            if is_open:
+                self._last_open = now
+            self.idle = not is_open
+            return is_open
+
+
+class MotionGatedRecognizer:
+    """Wraps a recognizer so static scenes reuse the last results."""
+
+    def __init__(self, recognizer, gate, metrics=NULL_METRICS):
+        self.recognizer = recognizer
+        self.gate = gate
+        self.metrics = metrics
+        self.results = []
+
+    def process(self, img):
+        with self.metrics.stage('motion'):
+            is_open = self.gate.check(img)
+        if is_open:
+            self.results = self.recognizer.process(img)
+        else:
+            self.metrics.count('gated_frames')
+        return self.results
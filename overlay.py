@@ -0,0 +1,53 @@
+"""Drawing of recognition results onto camera frames.
+
+Colors are given in BGR; pass ``channels='RGB'`` to draw on a frame that
+has already been converted for display.
+"""
+import cv2
+
+from recognition import confidence
+
+GREEN = (0, 255, 0)
+RED = (0, 0, 255)
+WHITE = (255, 255, 255)
+YELLOW = (0, 255, 255)
+
+
+def _color(bgr, channels):
+    return bgr if channels == 'BGR' else bgr[::-1]
+
+
+def draw_timestamp(img, now, channels='BGR'):
+    timestamp = now.strftime("%d/%m/%Y %H:%M:%S")
+    cv2.putText(img, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, _color(RED, channels), 2)
+
+
+def draw_face(img, result, marked=False, channels='BGR'):
+    """Draw the box and label for one FaceResult on a frame."""
+    y1, x2, y2, x1 = result.box
+    green, red = _color(GREEN, channels), _color(RED, channels)
+
+    if result.matched:
+        # Create a nicer looking rectangle
+        cv2.rectangle(img, (x1, y1), (x2, y2), green, 2)
+
+        # Add a background for the name
+        cv2.rectangle(img, (x1, y2-40), (x2, y2), green, cv2.FILLED)
+        cv2.putText(img, result.name.upper(), (x1+6, y2-10), cv2.FONT_HERSHEY_COMPLEX, 0.8, WHITE, 2)
+
+        # Show confidence
+        cv2.putText(img, f"Conf: {confidence(result)}%", (x1+6, y2-65), cv2.FONT_HERSHEY_COMPLEX, 0.5, WHITE, 1)
+
+        if marked:
+            # Add a "Marked" indicator
+            cv2.putText(img, "ATTENDANCE MARKED", (x1, y1-10), cv2.FONT_HERSHEY_COMPLEX, 0.7, green, 2)
+    elif result.quality is not None and result.quality.reason is not None:
+        # Not encoded: too small, blurred or turned away, so it isn't known to be a stranger
+        yellow = _color(YELLOW, channels)
+        cv2.rectangle(img, (x1, y1), (x2, y2), yellow, 1)
+        cv2.putText(img, result.quality.reason, (x1, y1-10), cv2.FONT_HERSHEY_COMPLEX, 0.5, yellow, 1)
+    else:
+        # Unknown face
+        cv2.rectangle(img, (x1, y1), (x2, y2), red, 2)
+        cv2.rectangle(img, (x1, y2-40), (x2, y2), red, cv2.FILLED)
+        cv2.putText(img, "Unknown", (x1+6, y2-10), cv2.FONT_HERSHEY_COMPLEX, 0.8, WHITE, 2)
@@ -0,0 +1,148 @@
+"""Threaded capture / recognition pipeline for the live camera loop.
+
+A capture thread keeps only the newest frames in a small drop-oldest buffer,
+a pool of worker threads runs recognition on the newest frame none of them
+has claimed yet, and the display stage overlays the most recent results on
+whatever frame is current. The preview therefore runs at camera FPS while
+recognition runs as fast as the workers allow.
+"""
+import os
+import threading
+from collections import deque
+
+from metrics import NULL_METRICS
+
+# Frames kept by the capture buffer; older frames are dropped
+BUFFER_SIZE = 2
+
+
+class LatestFrameBuffer:
+    """Bounded buffer of sequence-numbered frames that drops the oldest.
+
+    ``dropped`` counts frames that no consumer ever took: readers always get
+    the newest frame, so every sequence number skipped over is a drop.
+    """
+
+    def __init__(self, maxlen=BUFFER_SIZE):
+        self._frames = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._taken = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, frame):
+        with self._cond:
+            self._seq += 1
+            self._frames.append((self._seq, frame))
+            self._cond.notify_all()
+
+    def wait_newer(self, seq, timeout=None):
+        """Block until a frame newer than ``seq`` arrives; return (seq, frame).
+
+        Returns (seq, None) on timeout or once the buffer is closed.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.closed or (self._frames and self._frames[-1][0] > seq), timeout)
+            if self._frames and self._frames[-1][0] > seq:
+                newest = self._frames[-1][0]
+                if newest > self._taken:
+                    self.dropped += newest - self._taken - 1
+                    self._taken = newest
+                return self._frames[-1]
+            return seq, None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class RecognitionPipeline:
+    """Runs capture and recognition on background threads.
+
+    ``capture`` is anything with a cv2.VideoCapture-style ``read()``;
+    ``recognizer`` is a FrameRecognizer (or anything with ``process(frame)``).
+    ``on_results``, if given, is called from the worker thread with
+    ``(seq, results)`` each time newer results are published.
+    """
+
+    def __init__(self, capture, recognizer, workers=None, on_results=None, metrics=NULL_METRICS):
+        self.capture = capture
+        self.recognizer = recognizer
+        self.on_results = on_results
+        self.metrics = metrics
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.buffer = LatestFrameBuffer()
+        self.error = None
+        self._claimed = 0
+        self._results = (0, [])
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True)]
+        self._threads += [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.buffer.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def wait(self, timeout=None):
+        """Block until the pipeline stops; False if ``timeout`` expired first."""
+        return self._stop.wait(timeout)
+
+    def latest_results(self):
+        """Return (frame seq, results) for the most recently recognized frame."""
+        with self._lock:
+            return self._results
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            with self.metrics.stage('capture'):
+                success, frame = self.capture.read()
+            if not success:
+                self.error = "Failed to access camera. Please check your camera connection."
+                self._stop.set()
+                self.buffer.close()
+                break
+            self.buffer.put(frame)
+            self.metrics.tick('captured')
+            self.metrics.gauge('dropped_frames', self.buffer.dropped)
+
+    def _worker_loop(self):
+        seq = 0
+        while not self._stop.is_set():
+            with self._lock:
+                claimed = self._claimed
+            seq, frame = self.buffer.wait_newer(max(seq, claimed), timeout=0.5)
+            if frame is None:
+                continue
+            # Only one worker processes any given frame
+            with self._lock:
+                if seq <= self._claimed:
+                    continue
+                self._claimed = seq
+            try:
+                with self.metrics.stage('recognize'):
+                    results = self.recognizer.process(frame)
+            except Exception as e:
+                # A dead worker would otherwise leave the preview running with frozen results
+                self.error = f"Recognition failed: {e}"
+                self._stop.set()
+                self.buffer.close()
+                break
+            self.metrics.tick('recognized')
+            with self._lock:
+                # A slower worker may finish after a newer frame was published
+                published = seq > self._results[0]
+                if published:
+                    self._results = (seq, results)
+            if published and self.on_results:
+                self.on_results(seq, results)
@@ -0,0 +1,85 @@
+"""Cheap face quality checks between detection and encoding.
+
+Motion-blurred, tiny and turned-away faces cost a full embedding and then
+rarely match anyone, so they end up drawn as "Unknown". The gate scores
+each detected face before it is encoded:
+
+- size: the shorter side of the box, in full-frame pixels
+- sharpness: variance of the Laplacian of the face resized to a fixed size,
+  so it is comparable across face sizes
+- pose: yaw and roll estimated from the 5-point landmarks the encoder needs
+  anyway (nose offset from the middle of the eyes, tilt of the eye line)
+
+Size and sharpness are checked first, so landmarks are only fitted for
+faces that pass. ``score`` ranks acceptable faces, so a tracker can keep
+the best view of a face instead of encoding every one.
+"""
+import math
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Shorter box side, in full-frame pixels, below which a face is skipped
+MIN_FACE_SIZE = 48
+# Laplacian variance of the face at SHARPNESS_SIZE below which it is too blurred
+MIN_SHARPNESS = 40.0
+SHARPNESS_SIZE = 64
+# Nose offset from the middle of the eyes, as a fraction of the eye distance
+MAX_YAW = 0.35
+# Tilt of the eye line, in degrees
+MAX_ROLL = 25.0
+# Size and sharpness beyond which a face scores no higher
+GOOD_FACE_SIZE = 120
+GOOD_SHARPNESS = 300.0
+
+# reason is None for faces good enough to encode; yaw and roll are None until landmarks are checked
+FaceQuality = namedtuple('FaceQuality', ['score', 'size', 'sharpness', 'yaw', 'roll', 'reason'])
+
+
+def sharpness(rgb, box):
+    """Variance of the Laplacian of the face in ``box``, resized to SHARPNESS_SIZE."""
+    top, right, bottom, left = box
+    crop = rgb[max(top, 0):bottom, max(left, 0):right]
+    if crop.size == 0:
+        return 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+    gray = cv2.resize(gray, (SHARPNESS_SIZE, SHARPNESS_SIZE), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+
+def pose(shape):
+    """Return (yaw, roll) from a 5-point landmark shape (two corners per eye, then the nose)."""
+    points = np.array([(p.x, p.y) for p in shape.parts()], dtype=np.float32)
+    left_eye, right_eye = sorted(((points[0] + points[1]) / 2, (points[2] + points[3]) / 2), key=lambda p: p[0])
+    eye_distance = max(float(np.linalg.norm(right_eye - left_eye)), 1.0)
+    yaw = float(points[4][0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance
+    roll = math.degrees(math.atan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0]))
+    return yaw, roll
+
+
+class QualityGate:
+    """Decides which detected faces are worth encoding."""
+
+    def __init__(self, min_size=MIN_FACE_SIZE, min_sharpness=MIN_SHARPNESS, max_yaw=MAX_YAW, max_roll=MAX_ROLL):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+        self.max_roll = max_roll
+
+    def assess(self, rgb, box):
+        """Score a face by size and sharpness only (no landmarks needed)."""
+        top, right, bottom, left = box
+        size = min(bottom - top, right - left)
+        if size < self.min_size:
+            return FaceQuality(0.0, size, None, None, None, 'too small')
+        sharp = sharpness(rgb, box)
+        score = min(size / GOOD_FACE_SIZE, 1.0) * min(sharp / GOOD_SHARPNESS, 1.0)
+        reason = 'blurred' if sharp < self.min_sharpness else None
+        return FaceQuality(score, size, sharp, None, None, reason)
+
+    def check_pose(self, quality, shape):
+        """Add the landmark pose estimate to a passing FaceQuality."""
+        yaw, roll = pose(shape)
+        reason = 'turned away' if abs(yaw) > self.max_yaw or abs(roll) > self.max_roll else None
+        return quality._replace(yaw=yaw, roll=roll, reason=reason)
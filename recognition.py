@@ -0,0 +1,163 @@
+"""Detection -> encoding -> matching for camera frames.
+
+Faces are encoded through dlib's batched descriptor call: all faces of a
+frame (or of several frames) go through the network in one call instead of
+one call per face as ``face_recognition.face_encodings`` does. With a
+``quality.QualityGate``, faces too small, blurred or turned away to match
+are skipped before they reach the network.
+"""
+import threading
+from collections import namedtuple
+
+import cv2
+import dlib
+import face_recognition
+import numpy as np
+
+from metrics import NULL_METRICS
+from scheduler import DetectionScheduler
+
+# Attendance is only marked for matches more confident than this (percent)
+MIN_MARK_CONFIDENCE = 50
+# Resample each face this many times when encoding; slightly more accurate
+# and proportionally slower
+NUM_JITTERS = 1
+
+# box is (top, right, bottom, left) in full-frame pixel coordinates;
+# name is None for faces that don't match anyone on the roster;
+# quality is a quality.FaceQuality when a gate is used, and faces it rejects are not encoded
+FaceResult = namedtuple('FaceResult', ['box', 'name', 'distance', 'matched', 'quality'], defaults=(None,))
+
+
+def confidence(result):
+    return round((1 - result.distance) * 100, 2)
+
+
+def markable(result):
+    """True if a result is a confident enough match to mark attendance for."""
+    return result.matched and confidence(result) > MIN_MARK_CONFIDENCE
+
+
+def face_landmarks(rgb, boxes):
+    """5-point landmark shapes of the faces in ``boxes``, as used by the encoder."""
+    return face_recognition.api._raw_face_landmarks(rgb, boxes, model='small') if boxes else []
+
+
+def encode_batch(frames, num_jitters=NUM_JITTERS, shapes=None):
+    """Encode the faces of several (rgb, boxes) frames with one network call.
+
+    ``shapes`` optionally gives the landmark shapes of every frame's boxes
+    when they were already fitted. Returns one list of encodings per frame,
+    in box order.
+    """
+    frames = list(frames)
+    encodings = [[] for _ in frames]
+    images, faces, slots = [], [], []
+    for i, (rgb, boxes) in enumerate(frames):
+        if not boxes:
+            continue
+        landmarks = dlib.full_object_detections()
+        landmarks.extend(shapes[i] if shapes is not None else face_landmarks(rgb, boxes))
+        images.append(rgb)
+        faces.append(landmarks)
+        slots.append(i)
+    if images:
+        descriptors = face_recognition.api.face_encoder.compute_face_descriptor(images, faces, num_jitters)
+        for i, frame_descriptors in zip(slots, descriptors):
+            encodings[i] = [np.array(d) for d in frame_descriptors]
+    return encodings
+
+
+class FrameRecognizer:
+    """Runs the recognition path for one BGR frame against a FaceMatcher.
+
+    Where and at what scale faces are detected is decided by a
+    DetectionScheduler; faces are then encoded from the full-resolution
+    frame, so boxes are always in full-frame pixel coordinates.
+
+    The RGB conversion writes into a buffer reused across frames (one per
+    worker thread and batch slot), so the RGB frame returned by ``detect``
+    is only valid until that thread's next frame.
+    """
+
+    def __init__(self, matcher, scheduler=None, metrics=NULL_METRICS, num_jitters=NUM_JITTERS, gate=None):
+        self.matcher = matcher
+        self.scheduler = scheduler or DetectionScheduler(adaptive=False)
+        self.metrics = metrics
+        self.num_jitters = num_jitters
+        self.gate = gate
+        self._local = threading.local()
+
+    def detect(self, img, slot=0):
+        """Return the RGB frame and the face boxes found in it."""
+        buffers = self._local.__dict__.setdefault('rgb', {})
+        with self.metrics.stage('preprocess'):
+            rgb = buffers[slot] = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=buffers.get(slot))
+        with self.metrics.stage('detect'):
+            return rgb, self.scheduler.detect(rgb)
+
+    def quality(self, rgb, box):
+        """Size and sharpness score of a face, or None without a quality gate."""
+        return self.gate.assess(rgb, box) if self.gate is not None else None
+
+    def identify(self, rgb, boxes):
+        """Encode the given faces and match them against the roster."""
+        return self.identify_batch([(rgb, boxes)])[0]
+
+    def _gate(self, frames):
+        """Return the faces worth encoding per frame, their landmark shapes and every face's quality."""
+        kept, shapes, qualities = [], [], []
+        for rgb, boxes in frames:
+            frame_qualities = [self.gate.assess(rgb, box) for box in boxes]
+            passing = [i for i, quality in enumerate(frame_qualities) if quality.reason is None]
+            frame_shapes = face_landmarks(rgb, [boxes[i] for i in passing])
+            keep = []
+            for i, shape in zip(passing, frame_shapes):
+                frame_qualities[i] = self.gate.check_pose(frame_qualities[i], shape)
+                if frame_qualities[i].reason is None:
+                    keep.append((i, shape))
+            kept.append([i for i, _ in keep])
+            shapes.append([shape for _, shape in keep])
+            qualities.append(frame_qualities)
+        return kept, shapes, qualities
+
+    def identify_batch(self, frames):
+        """Encode and match the faces of several (rgb, boxes) frames at once."""
+        frames = list(frames)
+        if self.gate is not None:
+            with self.metrics.stage('quality'):
+                kept, shapes, qualities = self._gate(frames)
+            self.metrics.count('low_quality', sum(len(boxes) - len(keep) for (_, boxes), keep in zip(frames, kept)))
+        else:
+            kept = [range(len(boxes)) for _, boxes in frames]
+            shapes = None
+            qualities = [[None] * len(boxes) for _, boxes in frames]
+        with self.metrics.stage('encode'):
+            encodings = encode_batch([(rgb, [boxes[i] for i in keep]) for (rgb, boxes), keep in zip(frames, kept)],
+                                     self.num_jitters, shapes)
+
+        # Match every face of every frame against the roster in one batch
+        with self.metrics.stage('match'):
+            encodeCurFrame = [encoding for frame_encodings in encodings for encoding in frame_encodings]
+            matchIndices, faceDis, matches, matchNames = self.matcher.match(encodeCurFrame)
+
+        batch_results = []
+        start = 0
+        for (_, boxes), keep, frame_qualities in zip(frames, kept, qualities):
+            # Faces the gate rejected are reported unmatched, without a distance
+            results = [FaceResult(box, None, float('inf'), False, quality)
+                       for box, quality in zip(boxes, frame_qualities)]
+            for i, face in enumerate(keep, start):
+                results[face] = FaceResult(boxes[face], matchNames[i], float(faceDis[i]), bool(matches[i]),
+                                           frame_qualities[face])
+            batch_results.append(results)
+            start += len(keep)
+        return batch_results
+
+    def process(self, img):
+        rgb, boxes = self.detect(img)
+        return self.identify(rgb, boxes)
+
+    def process_many(self, imgs):
+        """Recognize several frames, encoding all of their faces in one batch."""
+        return self.identify_batch([self.detect(img, slot) for slot, img in enumerate(imgs)])
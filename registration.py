@@ -0,0 +1,114 @@
+"""Registration pipeline for uploaded photos.
+
+Phone photos are often 12 MP. Each upload is decoded once, faces are
+detected on a downscaled copy, and the photo is rejected unless it shows
+exactly one face of a usable size. The face is then cropped with a margin,
+downsized to at most ``CANONICAL_SIZE`` pixels and encoded straight away.
+Only the crop is written to Register_Data, its encoding goes into the
+encoding store and a small thumbnail is kept next to the store, so startup
+never decodes or encodes the original photo again.
+"""
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from encoding_store import THUMBNAIL_DIR, image_meta, new_photo_file, thumbnail_path
+
+# Longest side of the stored crop
+CANONICAL_SIZE = 400
+# Detection runs on a copy whose longest side is at most this
+DETECT_SIZE = 800
+# Margin kept around the face, as a fraction of the face size
+FACE_MARGIN = 0.5
+# Smallest accepted face side, in pixels of the original photo
+MIN_FACE_SIZE = 80
+THUMBNAIL_SIZE = 96
+JPEG_QUALITY = 90
+
+PreparedPhoto = namedtuple('PreparedPhoto', ['image', 'encoding', 'thumbnail', 'error'])
+
+
+def _rejected(error):
+    return PreparedPhoto(None, None, None, error)
+
+
+def _fit(img, size):
+    """Downsize ``img`` so its longest side is at most ``size``; never upscales."""
+    scale = size / max(img.shape[:2])
+    if scale >= 1:
+        return img, 1.0
+    return cv2.resize(img, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA), scale
+
+
+def prepare_photo(data):
+    """Decode, validate, crop and encode one uploaded photo given as bytes.
+
+    Returns a PreparedPhoto whose ``image`` and ``thumbnail`` are BGR crops,
+    or one with only ``error`` set when the photo can't be used.
+    """
+    import face_recognition
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return _rejected("the file could not be read as an image")
+
+    small, scale = _fit(img, DETECT_SIZE)
+    locations = face_recognition.face_locations(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+    if not locations:
+        return _rejected("no face found")
+    if len(locations) > 1:
+        return _rejected(f"{len(locations)} faces found; use a photo of one person")
+    top, right, bottom, left = (v / scale for v in locations[0])
+    face_size = max(bottom - top, right - left)
+    if face_size < MIN_FACE_SIZE:
+        return _rejected("the face is too small; move closer to the camera")
+
+    # Square crop around the face, clipped to the photo
+    half = face_size * (0.5 + FACE_MARGIN)
+    cy, cx = (top + bottom) / 2, (left + right) / 2
+    y0, x0 = max(int(cy - half), 0), max(int(cx - half), 0)
+    y1, x1 = min(int(cy + half), img.shape[0]), min(int(cx + half), img.shape[1])
+    crop, crop_scale = _fit(img[y0:y1, x0:x1], CANONICAL_SIZE)
+    crop = np.ascontiguousarray(crop)
+    box = tuple(int(round(v)) for v in ((top - y0) * crop_scale, (right - x0) * crop_scale,
+                                        (bottom - y0) * crop_scale, (left - x0) * crop_scale))
+    encoding = face_recognition.face_encodings(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB), [box])[0]
+    thumbnail, _ = _fit(crop, THUMBNAIL_SIZE)
+    return PreparedPhoto(crop, encoding, thumbnail, None)
+
+
+def clean_name(name):
+    """Return ``name`` made safe for a Register_Data folder, or None if nothing usable is left.
+
+    Path separators become dashes, and empty names and names starting with a
+    dot (``.``, ``..``, hidden folders) are refused, so a photo can never be
+    written outside its person's folder.
+    """
+    name = name.strip().replace('/', '-').replace('\\', '-')
+    if not name or name.startswith('.'):
+        return None
+    return name
+
+
+def register_photos(image_dir, store, name, photos):
+    """Save prepared photos of ``name`` and add their encodings to ``store``.
+
+    Returns the new files, relative to ``image_dir``.
+    """
+    if clean_name(name) != name:
+        raise ValueError(f"Invalid name {name!r}")
+    os.makedirs(os.path.join(store.store_dir, THUMBNAIL_DIR), exist_ok=True)
+    files = []
+    items = []
+    for photo in photos:
+        file = new_photo_file(image_dir, name, '.jpg')
+        cv2.imwrite(os.path.join(image_dir, file), photo.image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        meta = image_meta(image_dir, file)
+        cv2.imwrite(thumbnail_path(store.store_dir, meta['sha1']), photo.thumbnail,
+                    [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        files.append(file)
+        items.append((meta, photo.encoding))
+    store.put_many(items)
+    store.save()
+    return files
@@ -0,0 +1,78 @@
+"""Keeps the published roster in step with Register_Data while cameras run.
+
+Photos can be added, replaced or removed while a kiosk or the service is
+running: through the Register page, by another process or by hand. Every
+``poll_interval`` seconds the watcher compares the path, mtime and size of
+every photo with the previous poll (plain polling, so it works on network
+shares where file events are not delivered). On a change it syncs the
+encoding store, which only encodes new or changed photos, and publishes the
+new roster. Live matchers swap the new version in between frames.
+"""
+import os
+import threading
+
+from encoding_store import IMAGE_DIR, STORE_DIR, EncodingStore, list_images, store_lock
+from shared_roster import publish_roster
+from templates import MAX_TEMPLATES
+
+POLL_INTERVAL = 2.0
+
+
+def photo_signature(image_dir):
+    """(file, mtime, size) of every photo; changes whenever a photo is added, replaced or removed."""
+    signature = []
+    for file in list_images(image_dir):
+        try:
+            stat = os.stat(os.path.join(image_dir, file))
+        except FileNotFoundError:
+            # Removed since it was listed; the next poll sees it gone
+            continue
+        signature.append((file, stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+class RosterWatcher:
+    """Background thread that re-syncs and republishes the roster when photos change."""
+
+    def __init__(self, image_dir=IMAGE_DIR, store_dir=STORE_DIR, max_templates=MAX_TEMPLATES,
+                 poll_interval=POLL_INTERVAL):
+        self.image_dir = image_dir
+        self.store_dir = store_dir
+        self.max_templates = max_templates
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.error = None
+        # Photos already in the store when the watcher starts are not re-synced
+        self._signature = photo_signature(image_dir)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def poll(self):
+        """Sync and publish if any photo changed since the last poll; True if it did."""
+        signature = photo_signature(self.image_dir)
+        if signature == self._signature:
+            return False
+        with store_lock(self.store_dir):
+            store = EncodingStore(self.store_dir)
+            store.sync(self.image_dir)
+            publish_roster(store, self.max_templates)
+        self._signature = signature
+        self.reloads += 1
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+                self.error = None
+            except Exception as e:
+                # Keep serving the current roster; the change is retried at the next poll
+                self.error = f"Failed to reload registered faces: {e}"
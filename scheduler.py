@@ -0,0 +1,158 @@
+"""Adaptive detection resolution and region-of-interest scheduling.
+
+Instead of always downsampling the whole frame by a fixed factor, the
+scheduler picks a detection scale per frame:
+
+- around previously found faces it detects only in regions of interest,
+  scaled so the face appears at roughly ``target_face`` pixels to HOG (big
+  faces are shrunk more, small distant faces are kept sharp);
+- every ``sweep_every`` frames, when no face is known, or when a known face
+  was not found again, it sweeps the full frame at the largest scale that
+  the measured detector cost says fits in ``budget`` seconds.
+
+The detector cost is tracked as an exponentially weighted average of
+seconds per detection pixel, so the budget holds across machines and
+detector backends (see ``detectors``).
+
+Several recognition workers may share one scheduler. Each ``detect`` plans
+from one consistent snapshot of the known faces and only the newest frame's
+results replace them, while the detection itself runs unlocked.
+"""
+import threading
+import time
+
+import cv2
+
+from detectors import DEFAULT_DETECTOR, make_detector
+
+# Scale used until the detector cost has been measured, and when not adaptive
+DETECTION_SCALE = 0.25
+MIN_SCALE = 0.15
+MAX_SCALE = 1.0
+# Target detection time per frame, in seconds
+DETECT_BUDGET = 0.05
+# Face height (pixels in the detection image) that HOG finds reliably
+TARGET_FACE = 80
+# Full-frame sweep at least every this many frames
+SWEEP_EVERY = 15
+# Region of interest around a known face, as a fraction of the face size
+ROI_MARGIN = 0.75
+COST_SMOOTHING = 0.2
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _merge(regions):
+    """Merge overlapping (top, right, bottom, left) regions."""
+    merged = []
+    for region in sorted(regions, key=lambda r: (r[3], r[0])):
+        for i, other in enumerate(merged):
+            if region[0] < other[2] and other[0] < region[2] and region[3] < other[1] and other[3] < region[1]:
+                merged[i] = (min(region[0], other[0]), max(region[1], other[1]),
+                             max(region[2], other[2]), min(region[3], other[3]))
+                break
+        else:
+            merged.append(region)
+    return merged
+
+
+class DetectionScheduler:
+    """Chooses where and at what scale to run face detection each frame."""
+
+    def __init__(self, scale=DETECTION_SCALE, adaptive=True, budget=DETECT_BUDGET,
+                 min_scale=MIN_SCALE, max_scale=MAX_SCALE, target_face=TARGET_FACE,
+                 sweep_every=SWEEP_EVERY, roi_margin=ROI_MARGIN, detector=DEFAULT_DETECTOR):
+        self.scale = scale
+        self.adaptive = adaptive
+        self.budget = budget
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.target_face = target_face
+        self.sweep_every = sweep_every
+        self.roi_margin = roi_margin
+        # A detector name from detectors.DETECTORS, or any callable returning boxes
+        self.detector = make_detector(detector) if isinstance(detector, str) else detector
+        self.cost = None
+        self.faces = []
+        self._frames = 0
+        self._applied = 0
+        self._force_sweep = True
+        self._lock = threading.Lock()
+        # Resize buffers, reused across frames by each worker thread
+        self._local = threading.local()
+
+    def detect(self, rgb):
+        """Return face boxes (top, right, bottom, left) in ``rgb`` pixel coordinates."""
+        height, width = rgb.shape[:2]
+        if not self.adaptive:
+            return self._detect_region(rgb, (0, width, height, 0), self.scale)
+
+        with self._lock:
+            self._frames += 1
+            frame = self._frames
+            faces = self.faces
+            sweep = self._force_sweep or not faces or frame % self.sweep_every == 0
+        if sweep:
+            boxes = self._detect_region(rgb, (0, width, height, 0), self._sweep_scale(height * width))
+            force_sweep = False
+        else:
+            boxes = []
+            for region in self._regions(faces, height, width):
+                boxes += self._detect_region(rgb, region, self._region_scale(faces, region))
+            # A known face wasn't found near where it was: look everywhere next frame
+            force_sweep = len(boxes) < len(faces)
+        with self._lock:
+            # A worker that finishes late must not replace a newer frame's faces
+            if frame > self._applied:
+                self._applied = frame
+                self.faces = boxes
+                self._force_sweep = force_sweep
+        return boxes
+
+    def _sweep_scale(self, area):
+        if self.cost is None:
+            return self.scale
+        # Detection time grows with the number of pixels, i.e. with scale squared
+        return _clamp((self.budget / (self.cost * area)) ** 0.5, self.min_scale, self.max_scale)
+
+    def _regions(self, faces, height, width):
+        regions = []
+        for top, right, bottom, left in faces:
+            my = int((bottom - top) * self.roi_margin)
+            mx = int((right - left) * self.roi_margin)
+            regions.append((max(0, top - my), min(width, right + mx), min(height, bottom + my), max(0, left - mx)))
+        return _merge(regions)
+
+    def _region_scale(self, faces, region):
+        top, right, bottom, left = region
+        faces = [f for f in faces if top <= f[0] and f[2] <= bottom and left <= f[3] and f[1] <= right]
+        smallest = min((f[2] - f[0] for f in faces), default=bottom - top)
+        scale = _clamp(self.target_face / max(smallest, 1), self.min_scale, self.max_scale)
+        if self.cost is not None:
+            area = (bottom - top) * (right - left)
+            scale = min(scale, max(self.min_scale, (self.budget / (self.cost * area)) ** 0.5))
+        return scale
+
+    def _detect_region(self, rgb, region, scale):
+        top, right, bottom, left = region
+        crop = rgb[top:bottom, left:right]
+        if crop.size == 0:
+            return []
+        if scale == 1:
+            small = crop
+        else:
+            key = 'sweep' if crop.shape == rgb.shape else 'region'
+            small = cv2.resize(crop, (0, 0), dst=getattr(self._local, key, None), fx=scale, fy=scale)
+            setattr(self._local, key, small)
+        if small.size == 0:
+            return []
+        start = time.perf_counter()
+        locations = self.detector(small)
+        elapsed = time.perf_counter() - start
+        cost = elapsed / (small.shape[0] * small.shape[1])
+        with self._lock:
+            self.cost = cost if self.cost is None else (1 - COST_SMOOTHING) * self.cost + COST_SMOOTHING * cost
+        return [(int(t / scale) + top, int(r / scale) + left, int(b / scale) + top, int(l / scale) + left)
+                for t, r, b, l in locations]
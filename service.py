@@ -0,0 +1,207 @@
+"""Headless multi-camera recognition service.
+
+Reads a JSON config listing N camera sources (device indices, RTSP URLs or
+video files for testing) and runs one capture + recognition worker per
+stream. All streams share a single loaded encoding matrix and matcher, and
+every recognized face is funnelled through one queue into a single
+attendance writer. Photos added to or removed from Register_Data while the
+service runs are picked up without a restart (``watch_roster``).
+
+Example config (``cameras.json``)::
+
+    {
+        "cameras": [
+            {"name": "main-entrance", "source": 0},
+            {"name": "side-door", "source": "rtsp://10.0.0.12/stream1"},
+            {"name": "replay", "source": "recordings/monday.mp4"}
+        ],
+        "tracking": true,
+        "detect_every": 10,
+        "adaptive_detection": true,
+        "detect_budget": 0.05,
+        "motion_gate": true,
+        "motion_sensitivity": 0.01,
+        "motion_max_idle": 5.0,
+        "num_jitters": 1,
+        "detector": "hog",
+        "quality_gate": true,
+        "watch_roster": true,
+        "roster_poll_interval": 2.0
+    }
+
+Usage::
+
+    python -m service --config cameras.json [--images Register_Data] [--store Encoding_Store]
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+from datetime import datetime
+
+import cv2
+
+from attendance_store import AttendanceLog
+from attendance_writer import AttendanceWriter
+from detectors import DEFAULT_DETECTOR, make_detector
+from encoding_store import IMAGE_DIR, EncodingStore, default_store_dir, store_lock
+from mark_cache import MarkedTodayCache
+from matcher import FaceMatcher
+from motion import MAX_IDLE, SENSITIVITY, MotionGate, MotionGatedRecognizer
+from pipeline import RecognitionPipeline
+from quality import QualityGate
+from recognition import NUM_JITTERS, FrameRecognizer, markable
+from roster_watcher import POLL_INTERVAL, RosterWatcher
+from scheduler import DETECT_BUDGET, DetectionScheduler
+from tracking import DETECT_EVERY, TrackingRecognizer
+
+CONFIG_FILE = 'cameras.json'
+
+
+def load_config(config_path):
+    with open(config_path) as f:
+        config = json.load(f)
+    if not config.get('cameras'):
+        raise ValueError(f"{config_path} lists no cameras")
+    for i, camera in enumerate(config['cameras']):
+        camera.setdefault('name', f"camera-{i}")
+    return config
+
+
+def open_source(source):
+    """Open a device index, stream URL or video file as a cv2.VideoCapture."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source {source!r}")
+    return cap
+
+
+class AttendanceWriterThread(threading.Thread):
+    """Single consumer that turns recognition events into attendance records."""
+
+    def __init__(self, events, attendance):
+        super().__init__(daemon=True)
+        self.events = events
+        self.attendance = attendance
+        self.cache = MarkedTodayCache()
+
+    def run(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            camera, name, when = event
+            if self.cache.should_mark(name, when):
+                is_new = self.attendance.mark(name.upper(), when)
+                self.cache.record(name, is_new, when)
+                if is_new:
+                    print(f"{when:%H:%M:%S} [{camera}] marked {name.upper()}", flush=True)
+        self.attendance.close()
+
+
+class RecognitionService:
+    """Runs one recognition pipeline per configured camera."""
+
+    def __init__(self, config, image_dir=IMAGE_DIR, store_dir=None):
+        self.config = config
+        # Photos other than Register_Data get their own store, so the kiosks' roster is left alone
+        store_dir = store_dir or default_store_dir(image_dir)
+        with store_lock(store_dir):
+            store = EncodingStore(store_dir)
+            failed = store.sync(image_dir)
+            # One matcher shared read-only by every stream
+            self.matcher = FaceMatcher.from_store(store)
+        for file in failed:
+            print(f"No face found in {file}", file=sys.stderr)
+        # Built once so a missing model fails at startup; its models are loaded per worker thread
+        self.detector = make_detector(config.get('detector', DEFAULT_DETECTOR))
+        self.watcher = None
+        if config.get('watch_roster', True):
+            self.watcher = RosterWatcher(image_dir, store_dir,
+                                         poll_interval=config.get('roster_poll_interval', POLL_INTERVAL))
+        self.events = queue.Queue()
+        self.writer = AttendanceWriterThread(self.events, AttendanceWriter(AttendanceLog()))
+        self.streams = {}
+
+    def _recognizer(self):
+        scheduler = DetectionScheduler(adaptive=self.config.get('adaptive_detection', True),
+                                       budget=self.config.get('detect_budget', DETECT_BUDGET),
+                                       detector=self.detector)
+        gate = QualityGate() if self.config.get('quality_gate', True) else None
+        recognizer = FrameRecognizer(self.matcher, scheduler, num_jitters=self.config.get('num_jitters', NUM_JITTERS),
+                                     gate=gate)
+        # Tracker, scheduler and motion state are per stream; only the matcher is shared
+        if self.config.get('tracking', True):
+            recognizer = TrackingRecognizer(recognizer, self.config.get('detect_every', DETECT_EVERY))
+        if self.config.get('motion_gate', True):
+            gate = MotionGate(sensitivity=self.config.get('motion_sensitivity', SENSITIVITY),
+                              max_idle=self.config.get('motion_max_idle', MAX_IDLE))
+            recognizer = MotionGatedRecognizer(recognizer, gate)
+        return recognizer
+
+    def _on_results(self, camera):
+        def publish(seq, results):
+            now = datetime.now()
+            for result in results:
+                if markable(result):
+                    self.events.put((camera, result.name, now))
+        return publish
+
+    def start(self):
+        self.writer.start()
+        if self.watcher is not None:
+            self.watcher.start()
+        for camera in self.config['cameras']:
+            cap = open_source(camera['source'])
+            pipeline = RecognitionPipeline(cap, self._recognizer(), workers=1,
+                                           on_results=self._on_results(camera['name']))
+            self.streams[camera['name']] = (cap, pipeline.start())
+            print(f"[{camera['name']}] started on {camera['source']!r}", flush=True)
+        return self
+
+    def wait(self):
+        """Block until every stream has ended (or Ctrl+C)."""
+        try:
+            for _, pipeline in self.streams.values():
+                while not pipeline.wait(0.5):
+                    pass
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self):
+        for name, (cap, pipeline) in self.streams.items():
+            pipeline.stop()
+            cap.release()
+            if pipeline.error:
+                # A video file that ran out of frames also ends with a read error
+                print(f"[{name}] stream ended: {pipeline.error}", file=sys.stderr)
+        self.events.put(None)
+        self.writer.join()
+        if self.watcher is not None:
+            self.watcher.stop()
+            if self.watcher.error:
+                print(self.watcher.error, file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run face recognition attendance on several cameras.")
+    parser.add_argument('--config', default=CONFIG_FILE, help="JSON file listing camera sources")
+    parser.add_argument('--images', default=IMAGE_DIR, help="directory of registration photos")
+    parser.add_argument('--store', default=None,
+                        help="encoding store directory (default: Encoding_Store for Register_Data, "
+                             "else a private store inside --images)")
+    args = parser.parse_args(argv)
+
+    service = RecognitionService(load_config(args.config), args.images, args.store).start()
+    try:
+        service.wait()
+    finally:
+        service.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
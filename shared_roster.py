@@ -0,0 +1,112 @@
+"""Roster template matrix shared by every recognition process on a host.
+
+The templates built from the encoding store are published as versioned
+files in the store directory: a float32 matrix (``roster-<version>.npy``)
+and its row labels (``roster-<version>.json``). ``roster.json`` points at
+the current version and is replaced atomically, so a reader always sees a
+complete roster. Readers map the matrix read-only, so every process on the
+host shares the same pages however many workers run, and a matcher remaps
+when a newer version is published.
+"""
+import glob
+import json
+import os
+
+import numpy as np
+
+from ann_index import update_saved_index
+from encoding_store import ENCODING_SIZE
+from locking import FileLock
+from templates import MAX_TEMPLATES, Roster, build_roster
+
+POINTER_FILE = 'roster.json'
+# Superseded versions kept for readers still switching over
+KEEP_VERSIONS = 2
+
+
+class SharedRoster:
+    """Versioned, memory-mapped roster files in ``store_dir``."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.pointer_path = os.path.join(store_dir, POINTER_FILE)
+
+    def _path(self, version, extension):
+        return os.path.join(self.store_dir, f'roster-{version:06d}{extension}')
+
+    def _pointer(self):
+        try:
+            with open(self.pointer_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def version(self):
+        """Currently published version, or None if nothing was published."""
+        pointer = self._pointer()
+        return pointer['version'] if pointer else None
+
+    def load(self):
+        """Return (version, Roster) with the encodings mapped read-only."""
+        missing = None
+        while True:
+            pointer = self._pointer()
+            if pointer is None:
+                return None, Roster(np.zeros((0, ENCODING_SIZE), dtype=np.float32), [], [])
+            version = pointer['version']
+            try:
+                with open(self._path(version, '.json')) as f:
+                    labels = json.load(f)
+                # An empty file can't be mapped
+                encodings = np.load(self._path(version, '.npy'), mmap_mode='r' if labels['names'] else None)
+            except FileNotFoundError:
+                # Superseded and cleaned up while we read the pointer: read it again
+                if version == missing:
+                    raise
+                missing = version
+                continue
+            return version, Roster(encodings, labels['names'], labels['keys'])
+
+    def publish(self, roster):
+        """Write ``roster`` as a new version unless it is already current; returns the version."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        with FileLock(self.pointer_path):
+            pointer = self._pointer()
+            version = pointer['version'] if pointer else 0
+            if pointer is not None:
+                with open(self._path(version, '.json')) as f:
+                    if json.load(f)['keys'] == list(roster.keys):
+                        return version
+            version += 1
+            # Files of the new version are complete before the pointer names them
+            with open(self._path(version, '.npy') + '.tmp', 'wb') as f:
+                np.save(f, np.ascontiguousarray(roster.encodings, dtype=np.float32))
+            os.replace(self._path(version, '.npy') + '.tmp', self._path(version, '.npy'))
+            with open(self._path(version, '.json') + '.tmp', 'w') as f:
+                json.dump({'names': list(roster.names), 'keys': list(roster.keys)}, f)
+            os.replace(self._path(version, '.json') + '.tmp', self._path(version, '.json'))
+            with open(self.pointer_path + '.tmp', 'w') as f:
+                json.dump({'version': version}, f)
+            os.replace(self.pointer_path + '.tmp', self.pointer_path)
+            self._prune(version)
+        return version
+
+    def _prune(self, version):
+        for path in glob.glob(os.path.join(glob.escape(self.store_dir), 'roster-*.*')):
+            old = os.path.basename(path)[len('roster-'):].split('.')[0]
+            if old.isdigit() and int(old) < version - KEEP_VERSIONS:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still mapped by a process on Windows; removed by a later publish
+                    pass
+
+
+def publish_roster(store, max_templates=MAX_TEMPLATES):
+    """Publish the templates of ``store`` for every process; returns its SharedRoster."""
+    shared = SharedRoster(store.store_dir)
+    # Only identities whose photos changed since the published version are rebuilt
+    roster = build_roster(store, max_templates, previous=shared.load()[1])
+    update_saved_index(roster, store.store_dir)
+    shared.publish(roster)
+    return shared
@@ -0,0 +1,63 @@
+"""Per-identity templates built from the encoding store.
+
+A person can be enrolled from several photos (``Register_Data/<name>/*.jpg``
+next to the legacy ``Register_Data/<name>.jpg``). Matching against every
+photo would grow the matcher with the number of photos, so each identity's
+encodings are reduced to at most ``max_templates`` templates: the encodings
+themselves when there are only a few, otherwise k-means centroids that cover
+the different lighting and poses. A face is scored against an identity by
+its nearest template, so one good template is enough to match.
+"""
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from ann_index import kmeans
+from encoding_store import ENCODING_SIZE
+
+# Templates kept per identity, whatever the number of enrollment photos
+MAX_TEMPLATES = 3
+
+Roster = namedtuple('Roster', ['encodings', 'names', 'keys'])
+
+
+def identity_templates(encodings, max_templates=MAX_TEMPLATES):
+    """Reduce one identity's encodings to at most ``max_templates`` rows."""
+    if len(encodings) <= max_templates:
+        return encodings
+    return kmeans(encodings, max_templates)
+
+
+def build_roster(store, max_templates=MAX_TEMPLATES, previous=None):
+    """Return the template matrix, the name of each row and stable row keys.
+
+    Identities keep the order in which they first appear in the store, and a
+    row key only changes when the identity's set of photos changes, so a
+    saved IVF index is updated incrementally as people are registered.
+    Identities whose photos are unchanged since the ``previous`` roster reuse
+    its templates instead of running k-means again.
+    """
+    rows = {}
+    for i, entry in enumerate(store.entries):
+        rows.setdefault(entry['name'], []).append(i)
+    # Rows of the previous roster by "name:digest", the key without its template number
+    cached = {}
+    if previous is not None:
+        for row, key in enumerate(previous.keys):
+            cached.setdefault(key.rpartition(':')[0], []).append(row)
+    templates = [np.zeros((0, ENCODING_SIZE), dtype=np.float32)]
+    names = []
+    keys = []
+    for name, members in rows.items():
+        digest = hashlib.sha1(''.join(sorted(store.entries[i]['sha1'] for i in members)).encode()).hexdigest()[:12]
+        reused = cached.get(f"{name}:{digest}")
+        if reused is not None and len(reused) == min(len(members), max_templates):
+            identity = previous.encodings[reused]
+        else:
+            identity = identity_templates(store.encodings[members], max_templates)
+        templates.append(identity)
+        names += [name] * len(identity)
+        keys += [f"{name}:{digest}:{t}" for t in range(len(identity))]
+    encodings = np.ascontiguousarray(np.concatenate(templates), dtype=np.float32)
+    return Roster(encodings, names, keys)
@@ -0,0 +1,18 @@
+from attendance_store import AttendanceLog
+from batch import run_batch
+from encoding_store import EncodingStore
+from matcher import FaceMatcher
+
+
+def test_empty_source(tmp_path):
+    source = tmp_path / 'frames'
+    source.mkdir()
+    matcher = FaceMatcher.from_store(EncodingStore(str(tmp_path / 'store')))
+    attendance = AttendanceLog(str(tmp_path / 'attendance.db'), str(tmp_path / 'attendance.csv'))
+
+    report = run_batch(str(source), matcher, attendance)
+
+    assert report['frames'] == 0
+    assert report['faces'] == 0
+    assert report['fps'] == 0.0
+    assert report['marked'] == []
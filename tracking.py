@@ -0,0 +1,164 @@
+"""Detect-once, track-between-detections mode for the camera loop.
+
+Full detection runs only every ``detect_every`` frames, or as soon as a
+track is lost. In between, each face is followed by template matching in a
+small search window around its last box, and its identity is carried along
+the track. At detection frames, boxes are associated with existing tracks by
+IoU so already identified faces are not re-encoded; only new or still
+unknown faces go through the embedding and matcher. With a quality gate, a
+still unknown face is only encoded again from a better view than the last
+one tried, and a rejected view never replaces what a track already knows.
+"""
+import itertools
+import threading
+
+import cv2
+
+DETECT_EVERY = 10
+IOU_THRESHOLD = 0.3
+# Normalized cross-correlation below this means the tracker lost the face
+MIN_TRACK_SCORE = 0.5
+# Re-run the encoder on identified tracks every this many detections
+REIDENTIFY_EVERY = 10
+# Search window around the previous box, as a fraction of the box size
+SEARCH_MARGIN = 0.5
+# Templates are matched at this scale to keep tracking cheap
+TRACK_SCALE = 0.5
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    _ids = itertools.count(1)
+
+    def __init__(self, result):
+        self.id = next(self._ids)
+        self.result = result
+        self.template = None
+        self.detections = 0
+        # Quality score of the last view that was encoded for this track
+        self.best_score = None
+
+    @property
+    def box(self):
+        return self.result.box
+
+    def move(self, box):
+        self.result = self.result._replace(box=box)
+
+
+class TrackingRecognizer:
+    """Wraps a FrameRecognizer with between-detection tracking.
+
+    Tracks are state carried from frame to frame, so ``process`` must see
+    frames in order; calls are serialized with a lock.
+    """
+
+    def __init__(self, recognizer, detect_every=DETECT_EVERY, iou_threshold=IOU_THRESHOLD,
+                 min_score=MIN_TRACK_SCORE, reidentify_every=REIDENTIFY_EVERY):
+        self.recognizer = recognizer
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.min_score = min_score
+        self.reidentify_every = reidentify_every
+        self.tracks = []
+        self._since_detect = 0
+        self._lock = threading.Lock()
+        # Reused for every frame; templates are copied out of the gray frame
+        self._small = None
+        self._gray = None
+
+    def process(self, img):
+        with self._lock:
+            self._small = cv2.resize(img, (0, 0), dst=self._small, fx=TRACK_SCALE, fy=TRACK_SCALE)
+            gray = self._gray = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            self._since_detect += 1
+            if self.tracks and self._since_detect < self.detect_every:
+                with self.recognizer.metrics.stage('track'):
+                    followed = self._follow(gray)
+                if followed:
+                    return [track.result for track in self.tracks]
+            self._detect(img, gray)
+            self._since_detect = 0
+            return [track.result for track in self.tracks]
+
+    def _follow(self, gray):
+        """Move every track by template matching; False if any track is lost."""
+        height, width = gray.shape
+        for track in self.tracks:
+            top, right, bottom, left = (int(v * TRACK_SCALE) for v in track.box)
+            th, tw = track.template.shape
+            my, mx = int((bottom - top) * SEARCH_MARGIN), int((right - left) * SEARCH_MARGIN)
+            y0, x0 = max(0, top - my), max(0, left - mx)
+            y1, x1 = min(height, bottom + my), min(width, right + mx)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < th or window.shape[1] < tw:
+                return False
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < self.min_score:
+                return False
+            top, left = y0 + dy, x0 + dx
+            track.move(tuple(int(round(v / TRACK_SCALE)) for v in (top, left + tw, top + th, left)))
+        return True
+
+    def _detect(self, img, gray):
+        rgb, boxes = self.recognizer.detect(img)
+
+        # Greedy IoU association of detections with existing tracks
+        pairs = sorted(((iou(track.box, box), t, d) for t, track in enumerate(self.tracks)
+                        for d, box in enumerate(boxes)), reverse=True)
+        track_for = {}
+        used_tracks = set()
+        for overlap, t, d in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in used_tracks or d in track_for:
+                continue
+            used_tracks.add(t)
+            track_for[d] = self.tracks[t]
+
+        tracks = []
+        pending = []
+        for d, box in enumerate(boxes):
+            track = track_for.get(d)
+            if track is not None:
+                track.detections += 1
+                track.move(box)
+                # Identified faces keep their identity without re-encoding
+                if track.result.matched and track.detections % self.reidentify_every:
+                    tracks.append(track)
+                    continue
+                # An unknown face already encoded from an equal or better view is not encoded again
+                if track.best_score is not None and track.detections % self.reidentify_every:
+                    quality = self.recognizer.quality(rgb, box)
+                    if quality is not None and quality.score <= track.best_score:
+                        tracks.append(track)
+                        continue
+            pending.append((d, track))
+
+        if pending:
+            results = self.recognizer.identify(rgb, [boxes[d] for d, _ in pending])
+            for (d, track), result in zip(pending, results):
+                rejected = result.quality is not None and result.quality.reason is not None
+                if track is None:
+                    track = Track(result)
+                elif not rejected:
+                    track.result = result
+                if result.quality is not None and not rejected:
+                    track.best_score = result.quality.score
+                tracks.append(track)
+
+        for track in tracks:
+            top, right, bottom, left = (int(v * TRACK_SCALE) for v in track.box)
+            track.template = gray[max(0, top):bottom, max(0, left):right].copy()
+        self.tracks = [track for track in tracks if track.template.size]